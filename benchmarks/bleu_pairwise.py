@@ -0,0 +1,105 @@
+"""
+Benchmark of the sentence-level BLEU best-match search.
+
+Compares, on synthetic threat tables of N input rows by N reference rows:
+  - nltk:     sentence_bleu for every pair, as BLEUEvaluator did before bleu_engine
+  - per-pair: bleu_engine statistics for every pair, from n-grams counted once
+  - matrix:   bleu_engine.pairwise_bleu over all pairs, then an argmax per input row
+
+Usage:
+    python benchmarks/bleu_pairwise.py
+    python benchmarks/bleu_pairwise.py --sizes 100 500 1000 --nltk-max 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluators.bleu_engine import NgramStats, bleu_stats, bleu_from_stats, pairwise_bleu
+
+WEIGHTS = [0.25, 0.25, 0.25, 0.25]
+
+def make_table(rows: int, rng: random.Random, vocabulary: list) -> list:
+    """Generate tokenized threat table rows of 20 to 60 tokens, drawn with a skewed word distribution."""
+    table = []
+    for _ in range(rows):
+        length = rng.randint(20, 60)
+        table.append([vocabulary[min(int(rng.expovariate(1 / 150)), len(vocabulary) - 1)] for _ in range(length)])
+    return table
+
+def best_matches_nltk(inputs: list, references: list) -> list:
+    """Best reference index per input row with NLTK, one sentence_bleu call per pair."""
+    from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
+    smoothing = SmoothingFunction().method1
+    best = []
+    for hypothesis in inputs:
+        scores = [sentence_bleu([reference], hypothesis, weights=WEIGHTS, smoothing_function=smoothing)
+                  for reference in references]
+        best.append(int(np.argmax(scores)))
+    return best
+
+def best_matches_per_pair(inputs: list, references: list) -> list:
+    """Best reference index per input row from counts made once, scored pair by pair."""
+    reference_stats = [NgramStats(tokens, len(WEIGHTS)) for tokens in references]
+    best = []
+    for tokens in inputs:
+        hypothesis = NgramStats(tokens, len(WEIGHTS))
+        scores = [bleu_from_stats(bleu_stats(hypothesis, [reference]), WEIGHTS) for reference in reference_stats]
+        best.append(int(np.argmax(scores)))
+    return best
+
+def best_matches_matrix(inputs: list, references: list) -> list:
+    """Best reference index per input row from the pairwise score matrix."""
+    scores = pairwise_bleu(
+        [NgramStats(tokens, len(WEIGHTS)) for tokens in inputs],
+        [NgramStats(tokens, len(WEIGHTS)) for tokens in references],
+        WEIGHTS
+    )
+    return np.argmax(scores, axis=1).tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the BLEU best-match search')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 500],
+                        help='Numbers of input and reference rows (N x N pairs)')
+    parser.add_argument('--nltk-max', type=int, default=200,
+                        help='Largest size timed with NLTK, which grows slowest')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic tables')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    
+    print(f"{'rows':>6} {'pairs':>8} {'nltk (s)':>10} {'per-pair (s)':>13} {'matrix (s)':>11} "
+          f"{'vs nltk':>8} {'vs per-pair':>12}")
+    for size in args.sizes:
+        inputs = make_table(size, rng, vocabulary)
+        references = make_table(size, rng, vocabulary)
+        
+        start = time.perf_counter()
+        matrix_best = best_matches_matrix(inputs, references)
+        matrix_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        per_pair_best = best_matches_per_pair(inputs, references)
+        per_pair_time = time.perf_counter() - start
+        
+        nltk_time = None
+        if size <= args.nltk_max:
+            start = time.perf_counter()
+            nltk_best = best_matches_nltk(inputs, references)
+            nltk_time = time.perf_counter() - start
+            assert nltk_best == per_pair_best, "per-pair best matches differ from NLTK"
+        assert matrix_best == per_pair_best, "matrix best matches differ from per-pair scoring"
+        
+        nltk_columns = f"{nltk_time:10.3f}" if nltk_time is not None else f"{'-':>10}"
+        speedup = f"{nltk_time / matrix_time:7.1f}x" if nltk_time is not None else f"{'-':>8}"
+        print(f"{size:>6} {size * size:>8} {nltk_columns} {per_pair_time:13.3f} {matrix_time:11.3f} "
+              f"{speedup} {per_pair_time / matrix_time:11.1f}x")
+
+if __name__ == '__main__':
+    main()
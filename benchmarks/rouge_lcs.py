@@ -0,0 +1,74 @@
+"""
+Benchmark of the ROUGE-L LCS lengths in the sentence-level best-match search.
+
+Compares, on synthetic threat tables of N input rows by N reference rows:
+  - rouge_score: the 2-D LCS table of rouge_score for every pair, as ROUGEEvaluator did before rouge_engine
+  - bit-parallel: rouge_engine.LcsIndex over all references, one pass per input row
+
+Usage:
+    python benchmarks/rouge_lcs.py
+    python benchmarks/rouge_lcs.py --sizes 100 500 1000 --table-max 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluators.rouge_engine import LcsIndex
+
+def make_table(rows: int, rng: random.Random, vocabulary_size: int) -> list:
+    """Generate threat table rows of 60 to 120 token ids, drawn with a skewed distribution."""
+    return [
+        [min(int(rng.expovariate(1 / 150)), vocabulary_size - 1) for _ in range(rng.randint(60, 120))]
+        for _ in range(rows)
+    ]
+
+def lcs_lengths_table(inputs: list, references: list) -> list:
+    """LCS lengths of every pair from rouge_score's LCS table."""
+    from rouge_score.rouge_scorer import _lcs_table
+    return [
+        [_lcs_table(reference, tokens)[-1][-1] for reference in references]
+        for tokens in inputs
+    ]
+
+def lcs_lengths_bit_parallel(inputs: list, references: list) -> list:
+    """LCS lengths of every pair, one bit-parallel pass over all references per input row."""
+    index = LcsIndex(references)
+    return [index.lengths(tokens) for tokens in inputs]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ROUGE-L LCS computation')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 500],
+                        help='Numbers of input and reference rows (N x N pairs)')
+    parser.add_argument('--table-max', type=int, default=100,
+                        help='Largest size timed with the rouge_score table, which grows slowest')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic tables')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    
+    print(f"{'rows':>6} {'pairs':>8} {'rouge_score (s)':>16} {'bit-parallel (s)':>17} {'speedup':>8}")
+    for size in args.sizes:
+        inputs = make_table(size, rng, 2000)
+        references = make_table(size, rng, 2000)
+        
+        start = time.perf_counter()
+        bit_parallel = lcs_lengths_bit_parallel(inputs, references)
+        bit_parallel_time = time.perf_counter() - start
+        
+        table_time = None
+        if size <= args.table_max:
+            start = time.perf_counter()
+            table = lcs_lengths_table(inputs, references)
+            table_time = time.perf_counter() - start
+            assert table == bit_parallel, "bit-parallel LCS lengths differ from rouge_score"
+        
+        table_column = f"{table_time:16.3f}" if table_time is not None else f"{'-':>16}"
+        speedup = f"{table_time / bit_parallel_time:7.1f}x" if table_time is not None else f"{'-':>8}"
+        print(f"{size:>6} {size * size:>8} {table_column} {bit_parallel_time:17.3f} {speedup}")
+
+if __name__ == '__main__':
+    main()
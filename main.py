@@ -1,5 +1,8 @@
 import os
+import time
 import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from src.config_parser import load_config
 from src.evaluators import get_evaluator
 from src.results_manager import ResultsManager
@@ -12,6 +15,9 @@ from src.dashboards.dimension_dashboard import launch_dimension_dashboard
 from src.dashboards.bertscore_dashboard import launch_bertscore_dashboard
 from src.dashboards.multi_dashboard import launch_multi_dashboard
 
+# Evaluators whose work is pure-Python computation and is run in processes when parallelized
+CPU_BOUND_EVALUATORS = {'bleu', 'rouge'}
+
 def main():
     """Main entry point for the evaluation script."""
     # Load environment variables
@@ -33,6 +39,9 @@ def main():
     parser.add_argument('--description', type=str, help='Description for the text pair (for command-line input)')
     parser.add_argument('--num-completions', type=int, help='Number of completions to generate per prompt')
     parser.add_argument('--run-id', type=str, help='Optional run ID to use for this evaluation run')
+    parser.add_argument('--workers', type=int, default=1, help='Number of file pairs to evaluate in parallel')
+    parser.add_argument('--batch', action='store_true', help='Send all dimension prompts through the provider batch API before evaluating')
+    parser.add_argument('--replay', action='store_true', help='Answer LLM prompts from the response cache only; fail on a cache miss')
     args = parser.parse_args()
     
     # Load configuration
@@ -72,22 +81,29 @@ def main():
             config['llms'][active_llm]['num_completions'] = args.num_completions
             print(f"Set number of completions for {active_llm} to {args.num_completions}")
     
-    # Initialize evaluator and results manager
-    evaluator = get_evaluator(config)
+    if args.replay:
+        config.setdefault('response_cache', {})['replay'] = True
+        print("Replay mode: LLM responses are read from the response cache only")
+    
+    # Initialize results manager
     results_manager = ResultsManager(config, run_id=config.get('run_id'))
     
     # Process single files or text if provided
-    if args.reference_file and args.input_file:
-        title = args.title or ""
-        description = args.description or ""
-        process_single_pair(args.reference_file, args.input_file, evaluator, results_manager, title, description)
-    elif args.reference and args.input:
-        title = args.title or ""
-        description = args.description or ""
-        process_direct_input(args.reference, args.input, evaluator, results_manager, title, description)
+    if (args.reference_file and args.input_file) or (args.reference and args.input):
+        evaluator = get_evaluator(config)
+        try:
+            title = args.title or ""
+            description = args.description or ""
+            if args.reference_file and args.input_file:
+                process_single_pair(args.reference_file, args.input_file, evaluator, results_manager, title, description)
+            else:
+                process_direct_input(args.reference, args.input, evaluator, results_manager, title, description)
+        finally:
+            # Stop worker processes and other resources held by the evaluators
+            evaluator.close()
     else:
         # Process files based on configuration
-        process_configured_files(config, evaluator, results_manager)
+        process_configured_files(config, results_manager, workers=args.workers, batch=args.batch)
 
 def process_single_pair(reference_file, input_file, evaluator, results_manager, title="", description="", tags=None):
     """Process a single pair of reference and input files."""
@@ -124,7 +140,7 @@ def process_direct_input(reference, input_text, evaluator, results_manager, titl
     )
     print(f"Results saved to {output_path}")
 
-def process_configured_files(config, evaluator, results_manager):
+def process_configured_files(config, results_manager, workers=1, batch=False):
     """Process file pairs based on configuration."""
     file_processor = FileProcessor(config)
     file_pairs = file_processor.get_file_pairs()
@@ -136,25 +152,47 @@ def process_configured_files(config, evaluator, results_manager):
     print(f"Found {len(file_pairs)} reference-input pairs to evaluate.")
     
     # Display info about evaluators
-    if hasattr(evaluator, 'evaluator_types'):
-        print(f"Using multiple evaluators: {', '.join(evaluator.evaluator_types)}")
+    evaluator_types = get_evaluator_types(config)
+    if len(evaluator_types) > 1:
+        print(f"Using multiple evaluators: {', '.join(evaluator_types)}")
     else:
-        evaluator_type = evaluator.__class__.__name__.replace('Evaluator', '').lower()
-        print(f"Using evaluator: {evaluator_type}")
+        print(f"Using evaluator: {evaluator_types[0]}")
     
-    if 'DimensionEvaluator' in str(evaluator.__class__) or hasattr(evaluator, 'evaluators'):
+    if 'dimension' in evaluator_types or len(evaluator_types) > 1:
         active_llm = config.get('active_llm', 'claude')
         num_completions = config.get('llms', {}).get(active_llm, {}).get('num_completions', 1)
         print(f"Using LLM: {active_llm} with {num_completions} completion(s) per prompt")
     
-    all_results = []
+    # Pairs evaluated in worker processes use evaluators created by each worker
+    in_processes = workers > 1 and all(evaluator_type in CPU_BOUND_EVALUATORS for evaluator_type in evaluator_types)
+    evaluator = None if in_processes else get_evaluator(config)
+    try:
+        if batch:
+            if evaluator is None:
+                print("Batch mode only applies to the dimension evaluator; evaluating without a batch")
+            else:
+                prefetch_batch(evaluator, file_processor, file_pairs)
+        
+        if workers > 1:
+            process_pairs_in_parallel(config, evaluator, results_manager, file_processor, file_pairs, workers)
+        else:
+            process_pairs_sequentially(evaluator, results_manager, file_processor, file_pairs)
+    finally:
+        # Stop worker processes and other resources held by the evaluators
+        if evaluator is not None:
+            evaluator.close()
     
+    launch_dashboard('multi' if len(evaluator_types) > 1 else evaluator_types[0], results_manager)
+
+def get_evaluator_types(config):
+    """Evaluator types of the configuration, from the types list or the legacy single type."""
+    return config.get('evaluator', {}).get('types', []) or [config.get('evaluator', {}).get('type', 'dimension')]
+
+def process_pairs_sequentially(evaluator, results_manager, file_processor, file_pairs):
+    """Evaluate file pairs one after another."""
     for pair in file_pairs:
-        reference_file = pair['reference_file']
-        input_file = pair['input_file']
-        
-        reference, reference_filename = file_processor.read_file(reference_file)
-        input_text, input_filename = file_processor.read_file(input_file)
+        reference, reference_filename = file_processor.read_file(pair['reference_file'])
+        input_text, input_filename = file_processor.read_file(pair['input_file'])
         
         title = pair.get('title', '')
         description = pair.get('description', '')
@@ -170,13 +208,100 @@ def process_configured_files(config, evaluator, results_manager):
             title, description, tags
         )
         print(f"Results saved to {output_path}")
-        
-        # Add title to use in the dashboard
-        results['title'] = title or os.path.splitext(input_filename)[0]
-        all_results.append(results)
+
+def prefetch_batch(evaluator, file_processor, file_pairs):
+    """
+    Generate the dimension responses of all file pairs with one provider batch.
+    
+    The evaluation that follows reads the responses from the batch instead of
+    calling the LLM, so results are saved as usual.
+    """
+    evaluators = getattr(evaluator, 'evaluators', [evaluator])
+    dimension_evaluators = [e for e in evaluators if e.__class__.__name__ == 'DimensionEvaluator']
+    if not dimension_evaluators:
+        print("Batch mode only applies to the dimension evaluator; evaluating without a batch")
+        return
     
+    text_pairs = [
+        (file_processor.read_file(pair['reference_file'])[0], file_processor.read_file(pair['input_file'])[0])
+        for pair in file_pairs
+    ]
+    for dimension_evaluator in dimension_evaluators:
+        dimension_evaluator.prefetch_batch(text_pairs)
+
+def process_pairs_in_parallel(config, evaluator, results_manager, file_processor, file_pairs, workers):
+    """
+    Evaluate file pairs across a pool of workers, saving results as they complete.
+    
+    LLM-bound evaluators run in threads sharing one evaluator (and its throttling),
+    while the CPU-bound evaluators (BLEU/ROUGE) of a multi-evaluator run in its
+    worker processes. When every evaluator is CPU-bound, evaluator is None and
+    pairs run in separate processes, each with its own evaluator instance.
+    """
+    if evaluator is None:
+        # Spawned rather than forked: the LLM SDKs start background threads that a fork would copy mid-lock
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker_evaluator,
+            initargs=(config,),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        evaluate = _evaluate_in_worker
+        print(f"Evaluating with {workers} processes")
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        evaluate = evaluator.evaluate
+        cpu_bound_types = [t for t in get_evaluator_types(config) if t in CPU_BOUND_EVALUATORS]
+        if cpu_bound_types and hasattr(evaluator, 'use_worker_processes'):
+            evaluator.use_worker_processes(workers)
+            print(f"Evaluating with {workers} threads; {', '.join(cpu_bound_types)} in worker processes")
+        else:
+            print(f"Evaluating with {workers} threads")
+    
+    start_time = time.monotonic()
+    with executor:
+        futures = {}
+        for pair in file_pairs:
+            reference, reference_filename = file_processor.read_file(pair['reference_file'])
+            input_text, input_filename = file_processor.read_file(pair['input_file'])
+            future = executor.submit(evaluate, reference, input_text)
+            futures[future] = (pair, reference, reference_filename, input_text, input_filename)
+        
+        for completed, future in enumerate(as_completed(futures), start=1):
+            pair, reference, reference_filename, input_text, input_filename = futures[future]
+            title = pair.get('title', '')
+            
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Error evaluating {input_filename}: {e}")
+                continue
+            
+            output_path = results_manager.save_results(
+                results, reference, input_text, reference_filename, input_filename,
+                title, pair.get('description', ''), pair.get('tags', [])
+            )
+            
+            elapsed = time.monotonic() - start_time
+            eta = elapsed / completed * (len(file_pairs) - completed)
+            print(f"[{completed}/{len(file_pairs)}] {input_filename} -> {output_path} "
+                  f"(elapsed {elapsed:.1f}s, ETA {eta:.1f}s)")
+
+# Evaluator instance of a worker process, created once by the pool initializer
+_worker_evaluator = None
+
+def _init_worker_evaluator(config):
+    """Create the evaluator used by this worker process."""
+    global _worker_evaluator
+    _worker_evaluator = get_evaluator(config)
+
+def _evaluate_in_worker(reference, input_text):
+    """Evaluate a pair with this worker process's evaluator."""
+    return _worker_evaluator.evaluate(reference, input_text)
+
+def launch_dashboard(evaluator_type, results_manager):
+    """Launch the dashboard matching the evaluator type."""
     # Launch the dashboard according to the evaluator
-    evaluator_type = evaluator.__class__.__name__.replace('Evaluator', '').lower()
     if evaluator_type == 'bleu':
         all_results = results_manager.load_all_results(evaluator_type)
         launch_bleu_dashboard(all_results)
@@ -24,7 +24,7 @@ class Evaluator:
         
         # Initialize only the active LLM API
         llm_config = config.get('llms', {}).get(self.active_llm, {})
-        self.llm_api = get_llm_api(self.active_llm, llm_config)
+        self.llm_api = get_llm_api(self.active_llm, llm_config, config)
     
     def evaluate(self, reference: str, input_text: str) -> Dict[str, Dict[str, Any]]:
         """
@@ -55,6 +55,10 @@ class BaseEvaluator(ABC):
             Dictionary of evaluation results
         """
         pass
+    
+    def close(self):
+        """Release the resources held by the evaluator, such as worker processes; nothing by default."""
+        pass
 
     # Preprocessing text by removing initial lines and threat tags - STRIDEGPT tool
     def _clean_text(self, text: str) -> str:
@@ -1,6 +1,14 @@
 import os
-from typing import Dict, Any, List
+import time
+import threading
+from typing import Dict, Any, List, Tuple
+from collections import defaultdict
 from .base_evaluator import BaseEvaluator
+from .bertscore_models import BERTScoreModel, get_bertscore_model
+from .embedding_cache import EmbeddingCache
+from .idf_table import load_or_build_idf_table
+from ..file_processor import FileProcessor
+import numpy as np
 import torch
 import warnings
 import logging
@@ -21,6 +29,31 @@ class BERTScoreEvaluator(BaseEvaluator):
         self.idf = config.get('evaluator', {}).get('bertscore', {}).get('idf', True)
         self.rescale_with_baseline = config.get('evaluator', {}).get('bertscore', {}).get('rescale_with_baseline', True)
         self.verbose = config.get('evaluator', {}).get('bertscore', {}).get('verbose', False)
+        # Batched mode embeds every sentence once and scores all pairs with matrix products
+        self.batched = config.get('evaluator', {}).get('bertscore', {}).get('batched', False)
+        self.batch_size = config.get('evaluator', {}).get('bertscore', {}).get('batch_size', 64)
+        # Load the model into the process-wide registry up front instead of on the first evaluation
+        self.warmup = config.get('evaluator', {}).get('bertscore', {}).get('warmup', False)
+        
+        # Seconds spent loading the model, reported separately from scoring time
+        self.load_seconds = 0.0
+        
+        # IDF table built once over the whole reference corpus and persisted between runs
+        self.idf_directory = config.get('evaluator', {}).get('bertscore', {}).get('idf_directory', '.cache/bertscore/idf')
+        self._idf_dict = None
+        self._idf_lock = threading.Lock()
+        
+        # On-disk store of sentence embeddings, so unchanged sentences are only embedded once
+        cache_config = config.get('evaluator', {}).get('bertscore', {}).get('embedding_cache', {})
+        self.embedding_cache = None
+        if cache_config.get('enabled', False) and not self.batched:
+            # The per-sentence path embeds through bert_score itself, which has no cache hook
+            print("Warning: BERTScore embedding_cache requires batched: true; the cache is not used")
+        elif cache_config.get('enabled', False):
+            self.embedding_cache = EmbeddingCache(
+                cache_config.get('directory', '.cache/bertscore/embeddings'),
+                max_size_mb=cache_config.get('max_size_mb', 1024)
+            )
         
         # Filter out transformer model initialization warnings if not in verbose mode
         if not self.verbose:
@@ -39,6 +72,10 @@ class BERTScoreEvaluator(BaseEvaluator):
         print(f"Initializing BERTScore evaluator with model: {self.model_name}")
         print(f"Using device: {self.device}")
         print(f"Note: Initialization warnings about model weights are expected and can be safely ignored.")
+        
+        if self.warmup:
+            self._import_bert_score()
+            self._get_scoring_model()
     
     def evaluate(self, reference: str, input_text: str) -> Dict[str, Any]:
         """
@@ -52,13 +89,7 @@ class BERTScoreEvaluator(BaseEvaluator):
             Dictionary of BERTScore results
         """
         # Import bert_score only when needed
-        if self.bert_score is None:
-            try:
-                import bert_score
-                self.bert_score = bert_score
-                print(f"Successfully imported bert_score library")
-            except ImportError:
-                raise ImportError("bert-score package is not installed. Please install it with 'pip install bert-score'")
+        self._import_bert_score()
         
         # Clean the reference and input texts
         reference = self._clean_text(reference)
@@ -78,6 +109,8 @@ class BERTScoreEvaluator(BaseEvaluator):
         # Calculate BERTScore
         try:
             print(f"Calculating BERTScore using {self.model_name}...")
+            load_seconds_before = self.load_seconds
+            start_time = time.perf_counter()
             
             # Temporarily disable specific warnings during calculation
             with warnings.catch_warnings():
@@ -88,43 +121,17 @@ class BERTScoreEvaluator(BaseEvaluator):
                     )
                 
                 # Prepare sentence-level results
-                sentence_results = []
-                f1_scores_list = []
-
-                for input_sentence in input_sentences:
-                    # Repeat the input sentence to match the number of reference sentences
-                    cands = [input_sentence] * len(reference_sentences)
-                    refs = reference_sentences
-
-                    P, R, F1 = self.bert_score.score(
-                        cands=cands,
-                        refs=refs,
-                        model_type=self.model_name,
-                        device=self.device,
-                        lang="en",  # Default to English, could be made configurable
-                        verbose=self.verbose,  # Controls showing progress
-                        idf=False,
-                        rescale_with_baseline=self.rescale_with_baseline  # Scales scores to be more interpretable
-                    )
-
-                    # Convert PyTorch tensors to Python lists
-                    precision_scores = P.tolist()
-                    recall_scores = R.tolist()
-                    f1_scores = F1.tolist()
-
-                    # Find the best matching reference sentence
-                    max_f1 = max(f1_scores)
-                    max_index = f1_scores.index(max_f1)
+                cache_stats = {'hits': 0, 'misses': 0}
+                if self.batched:
+                    sentence_results = self._score_batched(input_sentences, reference_sentences, cache_stats)
+                else:
+                    sentence_results = self._score_pairwise(input_sentences, reference_sentences)
 
-                    sentence_results.append({
-                        'input': input_sentence,
-                        'best_reference': reference_sentences[max_index],
-                        'precision': float(precision_scores[max_index]),
-                        'recall': float(recall_scores[max_index]),
-                        'f1': float(f1_scores[max_index])
-                    })
+                f1_scores_list = [result['f1'] for result in sentence_results]
 
-                    f1_scores_list.append(f1_scores[max_index])
+                # Time spent loading the model during this call is not scoring time
+                load_seconds = self.load_seconds - load_seconds_before
+                scoring_seconds = time.perf_counter() - start_time - load_seconds
 
                 # Calculate overall scores (average)
                 overall_f1 = float(sum(f1_scores_list) / len(f1_scores_list))
@@ -138,6 +145,11 @@ class BERTScoreEvaluator(BaseEvaluator):
                     'model': self.model_name,
                     'idf': self.idf,
                     'rescale_with_baseline': self.rescale_with_baseline,
+                    'batched': self.batched,
+                    'timing': {
+                        'model_load_seconds': load_seconds,
+                        'scoring_seconds': scoring_seconds
+                    },
                     'scores': {
                         'overall': {
                             'f1': overall_f1
@@ -146,6 +158,9 @@ class BERTScoreEvaluator(BaseEvaluator):
                     }
                 }
                 
+                if self.embedding_cache is not None:
+                    results['embedding_cache'] = cache_stats
+                
                 return results
                 
         except Exception as e:
@@ -158,6 +173,327 @@ class BERTScoreEvaluator(BaseEvaluator):
                 'error': str(e)
             }
     
+    def _score_pairwise(self, input_sentences: List[str], reference_sentences: List[str]) -> List[Dict[str, Any]]:
+        """
+        Find the best matching reference for each input sentence, scoring one
+        input sentence against all reference sentences per bert_score call.
+        
+        Args:
+            input_sentences: Sentences of the input text
+            reference_sentences: Sentences of the reference text
+            
+        Returns:
+            List of sentence-level results
+        """
+        from bert_score.utils import bert_cos_score_idf
+
+        scorer = self._get_scoring_model()
+        idf_dict = self._get_idf_dict(scorer, reference_sentences)
+
+        sentence_results = []
+
+        for input_sentence in input_sentences:
+            # Repeat the input sentence to match the number of reference sentences
+            cands = [input_sentence] * len(reference_sentences)
+            refs = reference_sentences
+
+            # Same computation as bert_score.score, but with the model from the registry
+            all_preds = bert_cos_score_idf(
+                scorer.model,
+                refs,
+                cands,
+                scorer.tokenizer,
+                idf_dict,
+                verbose=self.verbose,  # Controls showing progress
+                device=self.device,
+                batch_size=self.batch_size
+            ).cpu()
+            all_preds = self._rescale(all_preds, scorer)
+            P, R, F1 = all_preds[..., 0], all_preds[..., 1], all_preds[..., 2]
+
+            # Convert PyTorch tensors to Python lists
+            precision_scores = P.tolist()
+            recall_scores = R.tolist()
+            f1_scores = F1.tolist()
+
+            # Find the best matching reference sentence
+            max_f1 = max(f1_scores)
+            max_index = f1_scores.index(max_f1)
+
+            sentence_results.append({
+                'input': input_sentence,
+                'best_reference': reference_sentences[max_index],
+                'precision': float(precision_scores[max_index]),
+                'recall': float(recall_scores[max_index]),
+                'f1': float(f1_scores[max_index])
+            })
+
+        return sentence_results
+
+    def _score_batched(self, input_sentences: List[str], reference_sentences: List[str],
+                       cache_stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        """
+        Find the best matching reference for each input sentence by embedding
+        every sentence once and computing the full precision/recall/F1 matrix.
+        
+        This turns N x M forward passes into N + M, while producing the same
+        greedy-matching scores as bert_score.score.
+        
+        Args:
+            input_sentences: Sentences of the input text
+            reference_sentences: Sentences of the reference text
+            cache_stats: Embedding cache hit and miss counters, updated in place
+            
+        Returns:
+            List of sentence-level results
+        """
+        if not input_sentences or not reference_sentences:
+            raise ValueError("Both the reference and the input need at least one sentence")
+
+        scorer = self._get_scoring_model()
+        idf_dict = self._get_idf_dict(scorer, reference_sentences)
+
+        input_embeddings, input_weights = self._embed_sentences(scorer, input_sentences, idf_dict, cache_stats)
+        reference_embeddings, reference_weights = self._embed_sentences(scorer, reference_sentences, idf_dict, cache_stats)
+
+        P, R, F1 = self._greedy_match_matrix(
+            input_embeddings, input_weights, reference_embeddings, reference_weights
+        )
+
+        scores = self._rescale(torch.stack((P, R, F1), dim=-1), scorer)
+        P, R, F1 = scores[..., 0], scores[..., 1], scores[..., 2]
+
+        # Best matching reference sentence for every input sentence
+        best_indices = F1.argmax(dim=1).tolist()
+
+        sentence_results = []
+        for i, input_sentence in enumerate(input_sentences):
+            j = best_indices[i]
+            sentence_results.append({
+                'input': input_sentence,
+                'best_reference': reference_sentences[j],
+                'precision': float(P[i, j]),
+                'recall': float(R[i, j]),
+                'f1': float(F1[i, j])
+            })
+
+        return sentence_results
+
+    def _import_bert_score(self):
+        """Import the bert_score library on first use."""
+        if self.bert_score is None:
+            try:
+                import bert_score
+                self.bert_score = bert_score
+                print(f"Successfully imported bert_score library")
+            except ImportError:
+                raise ImportError("bert-score package is not installed. Please install it with 'pip install bert-score'")
+
+    def _get_scoring_model(self) -> BERTScoreModel:
+        """
+        Get the transformer, tokenizer and baseline from the process-wide registry.
+        
+        Returns:
+            The loaded BERTScore model
+        """
+        scorer, load_seconds = get_bertscore_model(self.model_name, self.device)
+        self.load_seconds += load_seconds
+        return scorer
+
+    def _get_idf_dict(self, scorer: BERTScoreModel, reference_sentences: List[str]):
+        """
+        Get the token weights to use for scoring.
+        
+        With idf enabled, the IDF table covers every reference file the run will
+        evaluate, so the weights do not depend on the pair being scored. When no
+        reference files are configured (e.g. direct text input), the current
+        reference sentences form the corpus.
+        
+        Args:
+            scorer: Model whose tokenizer defines the token ids
+            reference_sentences: Sentences of the current reference text
+            
+        Returns:
+            Mapping from token id to weight
+        """
+        if not self.idf:
+            return self._uniform_idf_dict(scorer.tokenizer)
+
+        with self._idf_lock:
+            if self._idf_dict is None:
+                corpus = self._reference_corpus()
+                if not corpus:
+                    return load_or_build_idf_table(
+                        reference_sentences, scorer.tokenizer, self.model_name, self.idf_directory
+                    )
+                self._idf_dict = load_or_build_idf_table(
+                    corpus, scorer.tokenizer, self.model_name, self.idf_directory
+                )
+            return self._idf_dict
+
+    def _reference_corpus(self) -> List[str]:
+        """
+        Collect the sentences of every reference file found by the FileProcessor.
+        
+        Returns:
+            Reference sentences, in file order
+        """
+        file_processor = FileProcessor(self.config)
+        reference_files = []
+        for pair in file_processor.get_file_pairs():
+            if pair['reference_file'] not in reference_files:
+                reference_files.append(pair['reference_file'])
+
+        corpus = []
+        for reference_file in sorted(reference_files):
+            reference, _ = file_processor.read_file(reference_file)
+            corpus.extend(self._split_into_sentences(self._clean_text(reference)))
+        return corpus
+
+    def _uniform_idf_dict(self, tokenizer):
+        """Without IDF weighting every token counts the same, except [CLS] and [SEP]."""
+        idf_dict = defaultdict(lambda: 1.0)
+        idf_dict[tokenizer.sep_token_id] = 0
+        idf_dict[tokenizer.cls_token_id] = 0
+        return idf_dict
+
+    def _rescale(self, scores: torch.Tensor, scorer: BERTScoreModel) -> torch.Tensor:
+        """
+        Rescale (P, R, F) scores with the model baseline, if enabled and available.
+        
+        Args:
+            scores: Tensor whose last dimension holds P, R and F
+            scorer: Model providing the baseline
+            
+        Returns:
+            The rescaled scores
+        """
+        if not self.rescale_with_baseline:
+            return scores
+        if scorer.baselines is None:
+            print(f"Warning: Baseline not found for {self.model_name}; scores are not rescaled")
+            return scores
+        return (scores - scorer.baselines) / (1 - scorer.baselines)
+
+    def _embed_sentences(self, scorer: BERTScoreModel, sentences: List[str], idf_dict,
+                         cache_stats: Dict[str, int]) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
+        """
+        Compute normalized token embeddings for each sentence, in length-sorted batches.
+        
+        Sentences found in the embedding cache are not passed through the model.
+        
+        Args:
+            scorer: Model used to embed the sentences
+            sentences: Sentences to embed
+            idf_dict: Mapping from token id to IDF weight
+            cache_stats: Embedding cache hit and miss counters, updated in place
+            
+        Returns:
+            Tuple of (per-sentence token embeddings, per-sentence token weights)
+        """
+        from bert_score.utils import get_bert_embedding, sent_encode
+
+        embeddings = [None] * len(sentences)
+        weights = [None] * len(sentences)
+        keys = [None] * len(sentences)
+        missing = []
+
+        for i, sentence in enumerate(sentences):
+            if self.embedding_cache is not None:
+                keys[i] = self.embedding_cache.make_key(scorer.model_type, scorer.num_layers, sentence)
+                cached = self.embedding_cache.get(keys[i])
+                if cached is not None:
+                    token_ids = sent_encode(scorer.tokenizer, sentence)
+                    if len(token_ids) == cached.shape[0]:
+                        embeddings[i] = torch.from_numpy(np.asarray(cached, dtype=np.float32))
+                        weights[i] = torch.tensor([idf_dict[t] for t in token_ids], dtype=torch.float)
+                        cache_stats['hits'] += 1
+                        continue
+                cache_stats['misses'] += 1
+            missing.append(i)
+
+        # Sort by length so each batch carries as little padding as possible
+        order = sorted(missing, key=lambda i: len(sentences[i].split(" ")), reverse=True)
+
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            batch = [sentences[i] for i in batch_indices]
+            emb, mask, padded_idf = get_bert_embedding(
+                batch, scorer.model, scorer.tokenizer, idf_dict, device=self.device
+            )
+            emb = emb.cpu()
+            mask = mask.cpu()
+            padded_idf = padded_idf.cpu()
+            for k, i in enumerate(batch_indices):
+                length = int(mask[k].sum().item())
+                token_embeddings = emb[k, :length].float()
+                token_embeddings = token_embeddings / token_embeddings.norm(dim=-1, keepdim=True)
+                if self.embedding_cache is not None:
+                    # Score with the stored float16 values so hits and misses agree exactly
+                    stored = token_embeddings.numpy().astype(np.float16)
+                    self.embedding_cache.put(keys[i], stored)
+                    token_embeddings = torch.from_numpy(stored.astype(np.float32))
+                embeddings[i] = token_embeddings
+                weights[i] = padded_idf[k, :length]
+
+        return embeddings, weights
+
+    def _greedy_match_matrix(self,
+                             cand_embeddings: List[torch.Tensor],
+                             cand_weights: List[torch.Tensor],
+                             ref_embeddings: List[torch.Tensor],
+                             ref_weights: List[torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Compute greedy-matching precision, recall and F1 for every candidate/reference pair.
+        
+        Args:
+            cand_embeddings: Normalized token embeddings of the candidate sentences
+            cand_weights: Token weights of the candidate sentences
+            ref_embeddings: Normalized token embeddings of the reference sentences
+            ref_weights: Token weights of the reference sentences
+            
+        Returns:
+            Tuple of (P, R, F1) tensors, each of shape (num_candidates, num_references)
+        """
+        from torch.nn.utils.rnn import pad_sequence
+
+        ref_pad = pad_sequence(ref_embeddings, batch_first=True)  # M x K x d
+        ref_mask = pad_sequence([torch.ones(len(e)) for e in ref_embeddings], batch_first=True)
+        ref_w = pad_sequence(ref_weights, batch_first=True)
+        ref_w = ref_w / ref_w.sum(dim=1, keepdim=True)
+
+        num_refs, ref_len = ref_mask.shape
+
+        # Bound the size of the similarity tensor by scoring candidates in chunks
+        max_cand_len = max(len(e) for e in cand_embeddings)
+        chunk_size = max(1, (1 << 25) // max(1, num_refs * ref_len * max_cand_len))
+
+        precision_rows, recall_rows = [], []
+        with torch.no_grad():
+            for start in range(0, len(cand_embeddings), chunk_size):
+                chunk = cand_embeddings[start:start + chunk_size]
+                cand_pad = pad_sequence(chunk, batch_first=True)  # C x L x d
+                cand_mask = pad_sequence([torch.ones(len(e)) for e in chunk], batch_first=True)
+                cand_w = pad_sequence(cand_weights[start:start + chunk_size], batch_first=True)
+                cand_w = cand_w / cand_w.sum(dim=1, keepdim=True)
+
+                # Token similarities for every pair: C x M x L x K
+                sim = torch.einsum('cld,mkd->cmlk', cand_pad, ref_pad)
+                sim = sim * (cand_mask[:, None, :, None] * ref_mask[None, :, None, :])
+
+                word_precision = sim.max(dim=3)[0]  # C x M x L
+                word_recall = sim.max(dim=2)[0]  # C x M x K
+
+                precision_rows.append((word_precision * cand_w[:, None, :]).sum(dim=-1))
+                recall_rows.append((word_recall * ref_w[None, :, :]).sum(dim=-1))
+
+        P = torch.cat(precision_rows, dim=0)
+        R = torch.cat(recall_rows, dim=0)
+        F1 = 2 * P * R / (P + R)
+        F1 = F1.masked_fill(torch.isnan(F1), 0.0)
+
+        return P, R, F1
+
     def _split_into_sentences(self, text: str) -> List[str]:
         """
         Split text into sentences for more granular evaluation.
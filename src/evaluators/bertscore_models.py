@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+class BERTScoreModel:
+    """A loaded BERTScore transformer with its tokenizer and rescaling baseline."""
+
+    def __init__(self, model_type: str, num_layers: int, device: str, model, tokenizer,
+                 baselines, load_time: float):
+        """
+        Initialize with the loaded components.
+
+        Args:
+            model_type: Name of the transformer model
+            num_layers: Layer whose representation is used for scoring
+            device: Device the model lives on
+            model: Transformer model truncated to num_layers
+            tokenizer: Tokenizer matching the model
+            baselines: Tensor of (P, R, F) rescaling baselines, or None if unavailable
+            load_time: Seconds spent loading the components
+        """
+        self.model_type = model_type
+        self.num_layers = num_layers
+        self.device = device
+        self.model = model
+        self.tokenizer = tokenizer
+        self.baselines = baselines
+        self.load_time = load_time
+
+# Process-wide registry of loaded models, keyed by (model_type, num_layers, device)
+_models: Dict[Tuple[str, int, str], BERTScoreModel] = {}
+_lock = threading.Lock()
+
+def get_bertscore_model(model_type: str, device: str, num_layers: Optional[int] = None,
+                        lang: str = "en") -> Tuple[BERTScoreModel, float]:
+    """
+    Get a BERTScore model from the registry, loading it on first use.
+
+    Args:
+        model_type: Name of the transformer model
+        device: Device to load the model on
+        num_layers: Layer to use (default: the layer bert_score recommends for the model)
+        lang: Language of the rescaling baseline
+
+    Returns:
+        Tuple of (loaded model, seconds spent loading it in this call)
+    """
+    from bert_score.utils import model2layers
+
+    if num_layers is None:
+        num_layers = model2layers[model_type]
+    key = (model_type, num_layers, device)
+
+    with _lock:
+        if key in _models:
+            return _models[key], 0.0
+
+        entry = _load_model(model_type, num_layers, device, lang)
+        _models[key] = entry
+        print(f"Loaded BERTScore model {model_type} (layer {num_layers}) on {device} in {entry.load_time:.2f} seconds")
+        return entry, entry.load_time
+
+def clear_bertscore_models():
+    """Drop every loaded model from the registry."""
+    with _lock:
+        _models.clear()
+
+def _load_model(model_type: str, num_layers: int, device: str, lang: str) -> BERTScoreModel:
+    """
+    Load the transformer, tokenizer and baseline-rescale tensor for a model.
+
+    Args:
+        model_type: Name of the transformer model
+        num_layers: Layer whose representation is used for scoring
+        device: Device to load the model on
+        lang: Language of the rescaling baseline
+
+    Returns:
+        The loaded model
+    """
+    import bert_score
+    import torch
+    from bert_score.utils import get_model, get_tokenizer
+
+    start = time.perf_counter()
+
+    tokenizer = get_tokenizer(model_type)
+    model = get_model(model_type, num_layers)
+    model.to(device)
+
+    baselines = None
+    baseline_path = os.path.join(
+        os.path.dirname(bert_score.__file__), "rescale_baseline", lang, f"{model_type}.tsv"
+    )
+    if os.path.isfile(baseline_path):
+        import pandas as pd
+        # Baseline columns are P, R, F for each layer
+        baselines = torch.from_numpy(
+            pd.read_csv(baseline_path).iloc[num_layers].to_numpy()
+        )[1:].float()
+
+    return BERTScoreModel(
+        model_type, num_layers, device, model, tokenizer, baselines,
+        time.perf_counter() - start
+    )
@@ -0,0 +1,162 @@
+import math
+from collections import Counter, defaultdict
+from typing import List, Sequence, Tuple
+import numpy as np
+
+# Count added to zero n-gram matches, as in NLTK's SmoothingFunction().method1
+EPSILON = 0.1
+
+class NgramStats:
+    """Length and n-gram counts of a tokenized sentence, counted once and reused for every comparison."""
+    
+    __slots__ = ('length', 'counts')
+    
+    def __init__(self, tokens: Sequence[str], max_order: int):
+        """
+        Count the n-grams of a sentence.
+        
+        Args:
+            tokens: Tokens of the sentence
+            max_order: Highest n-gram order to count
+        """
+        self.length = len(tokens)
+        # counts[n - 1] holds the n-grams as token tuples, as produced by nltk.util.ngrams
+        self.counts = [Counter(zip(*(tokens[i:] for i in range(n)))) for n in range(1, max_order + 1)]
+
+def bleu_stats(hypothesis: NgramStats, references: List[NgramStats]) -> Tuple[List[int], List[int], int, int]:
+    """
+    Compute the sufficient statistics of BLEU for a hypothesis against its references.
+    
+    Each hypothesis n-gram count is clipped to its highest count in any reference
+    by dictionary lookups, without recounting the references.
+    
+    Args:
+        hypothesis: N-gram counts of the hypothesis
+        references: N-gram counts of the references, with at least as many orders
+    
+    Returns:
+        Tuple of (clipped matches per order, hypothesis n-grams per order,
+        hypothesis length, closest reference length)
+    """
+    numerators = []
+    denominators = []
+    for n, counts in enumerate(hypothesis.counts):
+        if len(references) == 1:
+            reference_counts = references[0].counts[n]
+            numerator = sum(min(count, reference_counts.get(ngram, 0)) for ngram, count in counts.items())
+        else:
+            numerator = sum(
+                min(count, max(reference.counts[n].get(ngram, 0) for reference in references))
+                for ngram, count in counts.items()
+            )
+        numerators.append(numerator)
+        # At least 1, as in NLTK, for orders longer than the hypothesis
+        denominators.append(max(1, sum(counts.values())))
+    
+    # Closest reference length, preferring the shorter one on ties
+    reference_length = min(
+        (reference.length for reference in references),
+        key=lambda length: (abs(length - hypothesis.length), length)
+    )
+    return numerators, denominators, hypothesis.length, reference_length
+
+def bleu_from_stats(stats: Tuple[List[int], List[int], int, int], weights: Sequence[float],
+                    epsilon: float = EPSILON) -> float:
+    """
+    Compute BLEU with method1 smoothing from sufficient statistics.
+    
+    Several weightings (e.g. the overall score and each single n-gram order)
+    can be computed from the same statistics.
+    
+    Args:
+        stats: Statistics from bleu_stats
+        weights: Weight of each n-gram order, starting with unigrams
+        epsilon: Count added to orders without any match
+    
+    Returns:
+        BLEU score, equal to NLTK's sentence_bleu with SmoothingFunction(epsilon).method1
+    """
+    numerators, denominators, hypothesis_length, reference_length = stats
+    # No unigram match means no match at any order
+    if numerators[0] == 0:
+        return 0.0
+    
+    if hypothesis_length > reference_length:
+        brevity_penalty = 1.0
+    elif hypothesis_length == 0:
+        brevity_penalty = 0.0
+    else:
+        brevity_penalty = math.exp(1 - reference_length / hypothesis_length)
+    
+    precisions = [
+        (numerator + epsilon) / denominator if numerator == 0 else numerator / denominator
+        for numerator, denominator in zip(numerators, denominators)
+    ]
+    return brevity_penalty * math.exp(math.fsum(
+        weight * math.log(precision) for weight, precision in zip(weights, precisions)
+    ))
+
+def pairwise_bleu(hypotheses: List[NgramStats], references: List[NgramStats], weights: Sequence[float],
+                  epsilon: float = EPSILON) -> np.ndarray:
+    """
+    Compute the BLEU score of every hypothesis against every single reference.
+    
+    The clipped matches of all pairs are accumulated through an inverted index
+    from each reference n-gram to the references containing it, so the work is
+    proportional to the shared n-grams rather than to the number of pairs; the
+    brevity penalty and smoothing are then applied to the whole matrix at once.
+    
+    Args:
+        hypotheses: N-gram counts of the hypotheses
+        references: N-gram counts of the references, each scored on its own
+        weights: Weight of each n-gram order, starting with unigrams
+        epsilon: Count added to orders without any match
+    
+    Returns:
+        Matrix of shape (hypotheses, references); each entry equals bleu_from_stats
+        of the pair up to floating point rounding
+    """
+    scores = np.zeros((len(hypotheses), len(references)))
+    if not hypotheses or not references:
+        return scores
+    
+    log_precisions = np.zeros_like(scores)
+    unigram_matches = None
+    for n, weight in enumerate(weights):
+        # Reference indices and counts of each n-gram of this order
+        postings = defaultdict(lambda: ([], []))
+        for j, reference in enumerate(references):
+            for ngram, count in reference.counts[n].items():
+                indices, counts = postings[ngram]
+                indices.append(j)
+                counts.append(count)
+        postings = {ngram: (np.array(indices), np.array(counts)) for ngram, (indices, counts) in postings.items()}
+        
+        matches = np.zeros_like(scores)
+        denominators = np.empty(len(hypotheses))
+        for i, hypothesis in enumerate(hypotheses):
+            row = matches[i]
+            for ngram, count in hypothesis.counts[n].items():
+                if ngram in postings:
+                    indices, counts = postings[ngram]
+                    row[indices] += np.minimum(counts, count)
+            denominators[i] = max(1, sum(hypothesis.counts[n].values()))
+        
+        if n == 0:
+            unigram_matches = matches
+        precisions = np.where(matches == 0, epsilon, matches) / denominators[:, None]
+        log_precisions += weight * np.log(precisions)
+    
+    hypothesis_lengths = np.array([hypothesis.length for hypothesis in hypotheses], dtype=float)[:, None]
+    reference_lengths = np.array([reference.length for reference in references], dtype=float)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        brevity_penalty = np.where(
+            hypothesis_lengths > reference_lengths,
+            1.0,
+            np.where(hypothesis_lengths == 0, 0.0, np.exp(1 - reference_lengths / hypothesis_lengths))
+        )
+    
+    scores = brevity_penalty * np.exp(log_precisions)
+    # No unigram match means no match at any order
+    scores[unigram_matches == 0] = 0.0
+    return scores
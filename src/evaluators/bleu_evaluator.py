@@ -1,8 +1,10 @@
 import os
 from typing import Dict, Any, List, Tuple
 from .base_evaluator import BaseEvaluator
+from .bleu_engine import NgramStats, bleu_stats, bleu_from_stats, pairwise_bleu
 import nltk
 import math
+import numpy as np
 
 class BLEUEvaluator(BaseEvaluator):
     """Evaluates input texts using BLEU score metrics."""
@@ -18,6 +20,8 @@ class BLEUEvaluator(BaseEvaluator):
         self.bleu_config = config.get('evaluator', {}).get('bleu', {})
         self.max_ngram = self.bleu_config.get('max_ngram', 4)
         self.weights = self.bleu_config.get('weights', None)
+        # Number of best matching reference sentences reported per input sentence
+        self.top_k = self.bleu_config.get('top_k', 1)
         
         # Set up default weights if not specified
         if self.weights is None:
@@ -96,47 +100,46 @@ class BLEUEvaluator(BaseEvaluator):
             reference_tokens_flat = [token for sent in reference_tokens for token in sent]
             input_tokens_flat = [token for sent in input_tokens for token in sent]
             
+            # Count the n-grams of every text once; each comparison below only looks them up
+            max_order = max(self.max_ngram, len(self.weights))
+            reference_stats_flat = NgramStats(reference_tokens_flat, max_order)
+            input_stats_flat = NgramStats(input_tokens_flat, max_order)
+            reference_stats = [NgramStats(tokens, max_order) for tokens in reference_tokens]
+            input_stats = [NgramStats(tokens, max_order) for tokens in input_tokens]
+            
             # Calculate corpus-level BLEU score
-            corpus_bleu = self._calculate_bleu(
-                references=[reference_tokens_flat],
-                hypothesis=input_tokens_flat
-            )
+            corpus_stats = bleu_stats(input_stats_flat, [reference_stats_flat])
+            corpus_bleu = self._calculate_bleu(corpus_stats)
             
-            # Calculate BLEU for individual n-gram levels
+            # Calculate BLEU for individual n-gram levels, from the same statistics
             ngram_scores = {}
             for n in range(1, self.max_ngram + 1):
                 weights = [0] * self.max_ngram
                 weights[n-1] = 1.0
-                score = self._calculate_bleu(
-                    references=[reference_tokens_flat],
-                    hypothesis=input_tokens_flat,
-                    weights=weights
-                )
+                score = self._calculate_bleu(corpus_stats, weights=weights)
                 ngram_scores[f"{n}-gram"] = score
             
-            # Calculate sentence-level BLEU scores
+            # Calculate sentence-level BLEU scores of every input sentence against every reference sentence
+            pair_scores = pairwise_bleu(input_stats, reference_stats, self.weights)
+            # Reference indices by decreasing score; the stable sort keeps the first reference on ties
+            ranked = np.argsort(-pair_scores, axis=1, kind='stable')[:, :self.top_k]
+            
             sentence_bleu_scores = []
-            for i, input_sent_tokens in enumerate(input_tokens):
-                best_score = 0 
-                best_reference = None 
-
-                # For each sentence in the reference calculate the BLEU score
-                for reference_sent_tokens in reference_tokens:
-                    score = self._calculate_bleu(
-                        references=[reference_sent_tokens],
-                        hypothesis=input_sent_tokens
-                    )
-                    
-                    # If the BLEU score is better update the best match.
-                    if score > best_score:
-                        best_score = score
-                        best_reference = reference_sentences[reference_tokens.index(reference_sent_tokens)]
+            for i in range(len(input_sentences)):
+                # Only references with a positive score count as matches
+                matches = [(j, float(pair_scores[i, j])) for j in ranked[i] if pair_scores[i, j] > 0]
                 
-                sentence_bleu_scores.append({
+                sentence_scores = {
                     'input': input_sentences[i],
-                    'best_reference': best_reference,
-                    'bleu_for_this_sentence': best_score
-                })
+                    'best_reference': reference_sentences[matches[0][0]] if matches else None,
+                    'bleu_for_this_sentence': matches[0][1] if matches else 0
+                }
+                if self.top_k > 1:
+                    sentence_scores['top_references'] = [
+                        {'reference': reference_sentences[j], 'reference_index': int(j), 'bleu': score}
+                        for j, score in matches
+                    ]
+                sentence_bleu_scores.append(sentence_scores)
             
             # Prepare and return results
             results = {
@@ -195,14 +198,13 @@ class BLEUEvaluator(BaseEvaluator):
             print(f"Warning: NLTK word tokenization failed: {e}")
             return [w.strip().lower() for w in sentence.split() if w.strip()]
     
-    def _calculate_bleu(self, references: List[List[str]], hypothesis: List[str], 
+    def _calculate_bleu(self, stats: Tuple[List[int], List[int], int, int], 
                        weights: List[float] = None) -> float:
         """
         Calculate BLEU score.
         
         Args:
-            references: List of reference token lists
-            hypothesis: Hypothesis token list
+            stats: Statistics of a hypothesis against its references, from bleu_stats
             weights: Weights for n-grams (default: equal weights for n-grams up to max_ngram)
             
         Returns:
@@ -210,23 +212,10 @@ class BLEUEvaluator(BaseEvaluator):
         """
         weights = weights or self.weights
         
-        # Use NLTK's BLEU implementation
+        # Same result as NLTK's sentence_bleu with method1 smoothing, without recounting n-grams.
+        # An empty hypothesis or references have no unigram match and score 0
         try:
-            # If hypothesis is empty, return 0
-            if not hypothesis:
-                return 0.0
-                
-            # If all references are empty, return 0 if hypothesis is empty, 1 otherwise
-            if all(not ref for ref in references):
-                return 1.0 if not hypothesis else 0.0
-                
-            # Calculate BLEU score
-            bleu = nltk.translate.bleu_score.sentence_bleu(
-                references, 
-                hypothesis,
-                weights=weights,
-                smoothing_function=nltk.translate.bleu_score.SmoothingFunction().method1
-            )
+            bleu = bleu_from_stats(stats, weights)
             
             return bleu
         except Exception as e:
@@ -1,8 +1,17 @@
 import os
-from typing import Dict, Any, List
-from ..llm_apis import get_llm_api
+import re
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from ..llm_apis import get_llm_api, PrefixedPrompt
+from ..llm_apis.batch import get_batch_backend
+from ..http_client import close_async_http_clients
 from .base_evaluator import BaseEvaluator
 
+# The block of a prompt template holding the text pair, moved first when prefix caching is on
+CONTEXT_BLOCK = re.compile(r"Reference:\s*\{reference\}\s*Input:\s*\{input\}")
+
 class DimensionEvaluator(BaseEvaluator):
     """Evaluates input texts using LLMs across multiple dimensions."""
     
@@ -38,6 +47,28 @@ class DimensionEvaluator(BaseEvaluator):
         
         # Get the number of completions to generate
         self.num_completions = llm_config.get('num_completions', 1)
+        
+        # Maximum number of dimension prompts in flight at once (1 = sequential)
+        self.max_concurrency = config.get('evaluator', {}).get('dimension', {}).get('max_concurrency', 1)
+        # Send the prompts through the LLM API's async client from one event loop instead of threads
+        self.use_async = config.get('evaluator', {}).get('dimension', {}).get('async', False)
+        
+        # Responses generated ahead of time by a provider batch, keyed by rendered prompt
+        self.batch_responses = {}
+        
+        # Put the reference and input first as a prefix shared by all dimension prompts of a pair,
+        # so providers with prompt caching process it once per pair
+        self.prefix_caching = config.get('evaluator', {}).get('dimension', {}).get('prefix_caching', False)
+        self.llm_api.track_prompt_cache = self.prefix_caching
+        
+        # Score all dimensions of a pair with one prompt asking for a JSON object of scores
+        self.combined = config.get('evaluator', {}).get('dimension', {}).get('combined', False)
+        self.combined_prompt_file = config.get('evaluator', {}).get('dimension', {}).get('combined_prompt_file', 'prompts/combined.txt')
+        
+        # Stream the completions of score-only prompts and stop each one at its score;
+        # a dimension's max_tokens overrides the default output token limit of these calls
+        self.score_only = config.get('evaluator', {}).get('dimension', {}).get('score_only', False)
+        self.score_max_tokens = config.get('evaluator', {}).get('dimension', {}).get('score_max_tokens', 20)
     
     def evaluate(self, reference: str, input_text: str) -> Dict[str, Any]:
         """
@@ -54,6 +85,143 @@ class DimensionEvaluator(BaseEvaluator):
         if hasattr(self.llm_api, 'active_model_name'):
             llm_name = self.llm_api.active_model_name
 
+        results = {
+            'evaluator_type': 'dimension',
+            'llm': llm_name,
+            'num_completions': self.num_completions,
+            'dimensions': {}
+        }
+        
+        if self.combined:
+            return self._evaluate_combined(reference, input_text, results)
+        
+        dimension_prompts = self.render_prompts(reference, input_text)
+
+        # Prompts answered by a batch submitted beforehand are not sent again
+        prompts = [prompt for _, _, prompt in dimension_prompts]
+        pending = [prompt for prompt in prompts if prompt not in self.batch_responses]
+        max_tokens = {}
+        if self.score_only:
+            max_tokens = {
+                prompt: self.config['dimensions'][dim_name].get('max_tokens', self.score_max_tokens)
+                for dim_name, _, prompt in dimension_prompts
+            }
+        
+        generated = {}
+        if self.prefix_caching and len(pending) > 1 and (self.use_async or self.max_concurrency > 1):
+            # Send one prompt first so the shared prefix is cached before the others read it
+            generated[pending[0]] = self._generate_responses(pending[0], max_tokens.get(pending[0]))
+            pending = pending[1:]
+        
+        if self.use_async and len(pending) > 1:
+            pending_responses = asyncio.run(self._agenerate_all(pending, max_tokens))
+        elif self.max_concurrency > 1 and len(pending) > 1:
+            # Issue the prompts in parallel; the LLM API's throttling still applies to each call
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pending))) as executor:
+                pending_responses = list(executor.map(
+                    lambda prompt: self._generate_responses(prompt, max_tokens.get(prompt)), pending
+                ))
+        else:
+            pending_responses = [self._generate_responses(prompt, max_tokens.get(prompt)) for prompt in pending]
+        generated.update(zip(pending, pending_responses))
+
+        # Responses are looked up per prompt, so results follow the config order
+        for dim_name, weight, prompt in dimension_prompts:
+            responses = self.batch_responses[prompt] if prompt in self.batch_responses else generated[prompt]
+            results['dimensions'][dim_name] = {
+                'responses': responses,
+                'weight': weight
+            }
+
+        if self.prefix_caching:
+            results['prompt_cache'] = self._collect_prompt_cache_usage(prompts)
+
+        return results
+    
+    def _evaluate_combined(self, reference: str, input_text: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Evaluate all dimensions of a text pair with a single prompt.
+        
+        Each completion is parsed into one score per dimension, so the dimensions
+        get the same responses layout as with one prompt per dimension.
+        
+        Args:
+            reference: Reference text
+            input_text: Input text to evaluate
+            results: Results with the evaluator details, filled in place
+            
+        Returns:
+            Dictionary of results by dimension
+        """
+        dimensions = self._applicable_dimensions(reference, input_text)
+        if not dimensions:
+            return results
+        
+        prompt = self.render_combined_prompt(dimensions, reference, input_text)
+        responses = self.batch_responses[prompt] if prompt in self.batch_responses else self.llm_api.generate(prompt)
+        
+        dim_names = [dim_name for dim_name, _, _ in dimensions]
+        scores = [self._parse_combined_response(response, dim_names) for response in responses]
+        for dim_name, weight, _ in dimensions:
+            results['dimensions'][dim_name] = {
+                # Completions without a valid score for the dimension are left out of its average
+                'responses': [completion_scores[dim_name] for completion_scores in scores if dim_name in completion_scores],
+                'weight': weight
+            }
+        results['combined_responses'] = responses
+        
+        if self.prefix_caching:
+            results['prompt_cache'] = self._collect_prompt_cache_usage([prompt])
+        
+        return results
+    
+    def _collect_prompt_cache_usage(self, prompts: List[str]) -> Dict[str, Any]:
+        """
+        Sum the provider prompt cache usage of a pair's prompts.
+        
+        Args:
+            prompts: Prompts sent for the pair
+            
+        Returns:
+            Input token counts by cache outcome, and the share of input tokens read from the cache
+        """
+        totals = {'input_tokens': 0, 'cache_read_input_tokens': 0, 'cache_creation_input_tokens': 0}
+        for prompt in prompts:
+            usage = self.llm_api.pop_prompt_cache_usage(prompt) or {}
+            for key in totals:
+                totals[key] += usage.get(key, 0)
+        
+        total_input = sum(totals.values())
+        totals['hit_rate'] = totals['cache_read_input_tokens'] / total_input if total_input else 0.0
+        return totals
+    
+    def render_prompts(self, reference: str, input_text: str) -> List[Tuple[str, float, str]]:
+        """
+        Render the prompts of the dimensions that apply to a text pair.
+        
+        Args:
+            reference: Reference text
+            input_text: Input text to evaluate
+            
+        Returns:
+            List of (dimension name, weight, prompt) in configuration order
+        """
+        return [
+            (dim_name, weight, self._render_prompt(prompt_template, reference, input_text))
+            for dim_name, weight, prompt_template in self._applicable_dimensions(reference, input_text)
+        ]
+    
+    def _applicable_dimensions(self, reference: str, input_text: str) -> List[Tuple[str, float, str]]:
+        """
+        Select the dimensions of the threat category inferred from a text pair.
+        
+        Args:
+            reference: Reference text
+            input_text: Input text to evaluate
+            
+        Returns:
+            List of (dimension name, weight, prompt template) in configuration order
+        """
         possible_categories = ["Spoofing", "Tampering", "Repudiation", "Information Disclosure", "Elevation of Privilege", "Denial of Service"]
 
         text_combined = f"{reference} {input_text}".lower()
@@ -66,13 +234,7 @@ class DimensionEvaluator(BaseEvaluator):
                 inferred_category = category
                 first_position = pos
 
-        results = {
-            'evaluator_type': 'dimension',
-            'llm': llm_name,
-            'num_completions': self.num_completions,
-            'dimensions': {}
-        }
-        
+        dimensions = []
         for dim_name, dim_config in self.config.get('dimensions', {}).items():
             dim_category = dim_config.get('category', 'All')
 
@@ -85,15 +247,170 @@ class DimensionEvaluator(BaseEvaluator):
 
             weight = dim_config.get('weight', 0.0)
             prompt_template = self._load_prompt_from_file(prompt_file)
-            prompt = prompt_template.format(reference=reference, input=input_text)
-            responses = self.llm_api.generate(prompt)
-
-            results['dimensions'][dim_name] = {
-                'responses': responses,
-                'weight': weight
-            }
+            dimensions.append((dim_name, weight, prompt_template))
 
-        return results
+        return dimensions
+    
+    def render_combined_prompt(self, dimensions: List[Tuple[str, float, str]], reference: str, input_text: str) -> str:
+        """
+        Render one prompt asking for the scores of several dimensions as a JSON object.
+        
+        The evaluation criteria and steps of each dimension prompt are listed under
+        the dimension name, which is also the key of its score in the reply.
+        
+        Args:
+            dimensions: List of (dimension name, weight, prompt template)
+            reference: Reference text
+            input_text: Input text to evaluate
+            
+        Returns:
+            The rendered prompt
+        """
+        criteria = "\n\n".join(
+            f'Metric "{dim_name}":\n\n{self._dimension_criteria(prompt_template)}'
+            for dim_name, _, prompt_template in dimensions
+        )
+        keys = ", ".join(f'"{dim_name}"' for dim_name, _, _ in dimensions)
+        example = "{" + ", ".join(f'"{dim_name}": <score>' for dim_name, _, _ in dimensions) + "}"
+        
+        prompt_template = self._load_prompt_from_file(self.combined_prompt_file)
+        return prompt_template.format(criteria=criteria, keys=keys, example=example, reference=reference, input=input_text)
+    
+    def _dimension_criteria(self, prompt_template: str) -> str:
+        """Extract the evaluation criteria and steps of a dimension prompt template, without the text pair."""
+        match = CONTEXT_BLOCK.search(prompt_template)
+        end = match.start() if match else len(prompt_template)
+        start = prompt_template.find('Evaluation Criteria:', 0, end)
+        start = start + len('Evaluation Criteria:') if start != -1 else 0
+        # The criteria are inserted as a value, so escaped braces are unescaped here
+        return prompt_template[start:end].strip().replace('{{', '{').replace('}}', '}')
+    
+    def _parse_combined_response(self, response: str, dim_names: List[str]) -> Dict[str, str]:
+        """
+        Parse the JSON object of scores in a combined response.
+        
+        Args:
+            response: Completion of a combined prompt
+            dim_names: Names of the dimensions that were scored
+            
+        Returns:
+            Dictionary mapping each dimension with an integer score from 1 to 5 to the score as a string
+        """
+        # Tolerate text or code fences around the object
+        match = re.search(r"\{.*\}", response, re.DOTALL)
+        try:
+            scores = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            scores = None
+        if not isinstance(scores, dict):
+            print(f"Could not parse the scores in combined response: {response[:100]!r}")
+            return {}
+        
+        parsed = {}
+        for dim_name in dim_names:
+            try:
+                score = float(scores.get(dim_name))
+            except (TypeError, ValueError):
+                continue
+            # Scores outside the 1-5 scale are reported as missing like unparsable ones
+            if score.is_integer() and 1 <= score <= 5:
+                parsed[dim_name] = str(int(score))
+        
+        missing = [dim_name for dim_name in dim_names if dim_name not in parsed]
+        if missing:
+            print(f"No valid score in combined response for: {', '.join(missing)}")
+        return parsed
+    
+    def prefetch_batch(self, text_pairs: List[Tuple[str, str]]):
+        """
+        Generate the responses to every prompt of the given text pairs with one provider batch.
+        
+        Later evaluate calls for these pairs use the batch responses instead of calling the LLM.
+        
+        Args:
+            text_pairs: List of (reference, input_text)
+        """
+        prompts = []
+        for reference, input_text in text_pairs:
+            if self.combined:
+                dimensions = self._applicable_dimensions(reference, input_text)
+                if dimensions:
+                    prompts.append(self.render_combined_prompt(dimensions, reference, input_text))
+            else:
+                prompts.extend(prompt for _, _, prompt in self.render_prompts(reference, input_text))
+        
+        backend = get_batch_backend(self.llm_api, self.config)
+        self.batch_responses.update(backend.generate_all(prompts))
+    
+    def _render_prompt(self, prompt_template: str, reference: str, input_text: str) -> str:
+        """
+        Fill a prompt template with a text pair.
+        
+        With prefix caching, a template whose reference and input appear together
+        in one "Reference: ... Input: ..." block is reordered so that block comes
+        first, as a prefix identical across dimensions; the dimension instructions
+        follow it. Other templates are rendered as written.
+        
+        Args:
+            prompt_template: Template with {reference} and {input} placeholders
+            reference: Reference text
+            input_text: Input text to evaluate
+            
+        Returns:
+            The rendered prompt, a PrefixedPrompt when it was split
+        """
+        if self.prefix_caching:
+            match = CONTEXT_BLOCK.search(prompt_template)
+            if match:
+                suffix_template = prompt_template[:match.start()].rstrip() + "\n\n" + prompt_template[match.end():].lstrip()
+                if '{reference}' not in suffix_template and '{input}' not in suffix_template:
+                    prefix = f"Reference: {reference}\n\nInput: {input_text}\n\n"
+                    suffix = suffix_template.format(reference=reference, input=input_text)
+                    return PrefixedPrompt(prefix, suffix)
+        return prompt_template.format(reference=reference, input=input_text)
+    
+    def _generate_responses(self, prompt: str, max_tokens: Optional[int] = None) -> List[str]:
+        """
+        Generate the responses to a dimension prompt.
+        
+        Args:
+            prompt: Rendered prompt
+            max_tokens: Output token limit in score-only mode (None = full completions)
+            
+        Returns:
+            The responses, or only their scores in score-only mode
+        """
+        if max_tokens is None:
+            return self.llm_api.generate(prompt)
+        return self.llm_api.generate_score(prompt, max_tokens)
+    
+    async def _agenerate_all(self, prompts: List[str], max_tokens: Dict[str, int]) -> List[List[str]]:
+        """
+        Generate the responses to all prompts concurrently with the async LLM API.
+        
+        Runs as the whole of an asyncio.run loop, so the async clients and the
+        connection pool opened for the loop are closed before it ends.
+        
+        Args:
+            prompts: Rendered prompts, one per dimension
+            max_tokens: Output token limit of each prompt in score-only mode
+            
+        Returns:
+            The responses to each prompt, in order
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def generate(prompt: str) -> List[str]:
+            async with semaphore:
+                if prompt in max_tokens:
+                    return await self.llm_api.agenerate_score(prompt, max_tokens[prompt])
+                return await self.llm_api.agenerate(prompt)
+        
+        try:
+            return await asyncio.gather(*(generate(prompt) for prompt in prompts))
+        finally:
+            await self.llm_api.aclose()
+            await close_async_http_clients()
     
     def _load_prompt_from_file(self, prompt_file: str) -> str:
         """
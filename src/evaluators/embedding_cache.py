@@ -0,0 +1,130 @@
+import os
+import hashlib
+import threading
+import unicodedata
+from typing import Optional
+
+import numpy as np
+
+class EmbeddingCache:
+    """Content-addressed on-disk store of sentence token embeddings with LRU eviction."""
+
+    def __init__(self, directory: str, max_size_mb: float = 1024):
+        """
+        Initialize the cache and measure what is already stored.
+
+        Args:
+            directory: Directory holding the cached embeddings
+            max_size_mb: Size cap in megabytes; least recently used entries are evicted beyond it
+        """
+        self.directory = directory
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_size = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    @staticmethod
+    def normalize(sentence: str) -> str:
+        """
+        Normalize a sentence before hashing.
+
+        Only changes that do not alter the model input are applied, so a cached
+        embedding is exactly what the model would produce for the sentence.
+        """
+        return unicodedata.normalize('NFC', sentence).strip()
+
+    def make_key(self, model_type: str, num_layers: int, sentence: str) -> str:
+        """
+        Build the cache key for a sentence embedded by a given model and layer.
+
+        Args:
+            model_type: Name of the transformer model
+            num_layers: Layer whose representation is stored
+            sentence: Sentence text
+
+        Returns:
+            Hex digest identifying the embedding
+        """
+        content = f"{model_type}\0{num_layers}\0{self.normalize(sentence)}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up an embedding.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Memory-mapped float16 array of shape (tokens, hidden_size), or None on a miss
+        """
+        path = self._path(key)
+        try:
+            embedding = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return embedding
+
+    def put(self, key: str, embedding: np.ndarray):
+        """
+        Store an embedding as float16, evicting old entries if the cache is full.
+
+        Args:
+            key: Cache key from make_key
+            embedding: Array of shape (tokens, hidden_size)
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(embedding, dtype=np.float16))
+        size = os.path.getsize(tmp_path)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_size += size - replaced
+            if self.total_size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is under 90% of its cap."""
+        entries = []
+        for path in self._entry_paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self.total_size = sum(size for _, size, _ in entries)
+        target = int(self.max_size_bytes * 0.9)
+        for _, size, path in entries:
+            if self.total_size <= target:
+                break
+            try:
+                os.remove(path)
+                self.total_size -= size
+            except OSError:
+                pass
+
+    def _path(self, key: str) -> str:
+        """Path of the file holding an entry, sharded by key prefix."""
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def _entry_paths(self):
+        """Yield the paths of all stored entries."""
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if filename.endswith('.npy'):
+                    yield os.path.join(root, filename)
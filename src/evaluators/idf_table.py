@@ -0,0 +1,59 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from math import log
+from typing import List
+
+def load_or_build_idf_table(sentences: List[str], tokenizer, model_type: str, directory: str):
+    """
+    Load the IDF table for a reference corpus from disk, or build and persist it.
+
+    Every reference sentence counts as one document, as in bert_score. The table
+    is keyed by the model and the corpus contents, so it is rebuilt only when
+    the references change.
+
+    Args:
+        sentences: Reference sentences making up the corpus
+        tokenizer: Tokenizer of the BERTScore model
+        model_type: Name of the BERTScore model
+        directory: Directory holding the persisted tables
+
+    Returns:
+        Mapping from token id to IDF weight, usable as a bert_score idf_dict
+    """
+    digest = hashlib.sha256(model_type.encode('utf-8'))
+    for sentence in sentences:
+        digest.update(b'\0' + sentence.encode('utf-8'))
+    path = os.path.join(directory, f"{digest.hexdigest()}.json")
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return _to_idf_dict(data['num_docs'], {int(k): v for k, v in data['idf'].items()})
+        except (ValueError, KeyError, OSError) as e:
+            print(f"Warning: Unable to load IDF table {path}: {e}")
+
+    from bert_score.utils import get_idf_dict
+
+    print(f"Building IDF table over {len(sentences)} reference sentences...")
+    idf_dict = get_idf_dict(sentences, tokenizer, nthreads=0)
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'model': model_type,
+            'num_docs': len(sentences),
+            'idf': {str(k): v for k, v in idf_dict.items()}
+        }, f)
+    os.replace(tmp_path, path)
+
+    return idf_dict
+
+def _to_idf_dict(num_docs: int, idf: dict):
+    """Rebuild a bert_score idf_dict, where unseen tokens get the maximum IDF."""
+    idf_dict = defaultdict(lambda: log((num_docs + 1) / 1))
+    idf_dict.update(idf)
+    return idf_dict
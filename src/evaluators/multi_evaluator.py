@@ -1,6 +1,33 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from typing import Dict, Any, List
 from .base_evaluator import BaseEvaluator
 
+# How each evaluator type runs when evaluators are executed in parallel.
+# LLM calls wait on the network and BERTScore releases the GIL inside torch,
+# so threads suffice; BLEU and ROUGE are pure Python and need processes.
+DEFAULT_EXECUTORS = {
+    'dimension': 'thread',
+    'bertscore': 'thread',
+    'bleu': 'process',
+    'rouge': 'process'
+}
+
+# Evaluators of a worker process by type, created once by the pool initializer
+_worker_evaluators: Dict[str, BaseEvaluator] = {}
+
+def _init_worker_evaluators(config: Dict[str, Any], evaluator_types: List[str]):
+    """Create the evaluators run by this worker process, so their state is kept across pairs."""
+    from . import _create_single_evaluator
+    for evaluator_type in evaluator_types:
+        _worker_evaluators[evaluator_type] = _create_single_evaluator(evaluator_type, config)
+
+def _run_evaluator(evaluator_type: str, reference: str, input_text: str) -> Dict[str, Any]:
+    """Run this worker process's evaluator of a type; module-level so it can be sent to a worker process."""
+    return _worker_evaluators[evaluator_type].evaluate(reference, input_text)
+
 class MultiEvaluator(BaseEvaluator):
     """Runs multiple evaluators and aggregates their results."""
     
@@ -15,6 +42,22 @@ class MultiEvaluator(BaseEvaluator):
         super().__init__(config)
         self.evaluators = evaluators
         self.evaluator_types = [evaluator.__class__.__name__ for evaluator in self.evaluators]
+        
+        # Run the child evaluators at the same time instead of one after another
+        self.parallel = config.get('evaluator', {}).get('parallel', False)
+        self.executors = {}
+        for evaluator in self.evaluators:
+            evaluator_type = self._get_evaluator_type(evaluator)
+            default_executor = DEFAULT_EXECUTORS.get(evaluator_type, 'thread')
+            executor = config.get('evaluator', {}).get(evaluator_type, {}).get('executor', default_executor)
+            if executor not in ('thread', 'process'):
+                raise ValueError(f"Unsupported executor for {evaluator_type}: {executor}")
+            self.executors[evaluator_type] = executor
+        
+        # Worker processes are started on first use and reused for every pair
+        self.process_workers = None
+        self._process_pool = None
+        self._process_pool_lock = threading.Lock()
     
     def evaluate(self, reference: str, input_text: str) -> Dict[str, Any]:
         """
@@ -23,7 +66,7 @@ class MultiEvaluator(BaseEvaluator):
         Args:
             reference: Reference text
             input_text: Input text to evaluate
-            
+        
         Returns:
             Dictionary of results from all evaluators
         """
@@ -33,11 +76,15 @@ class MultiEvaluator(BaseEvaluator):
             'results': {}
         }
         
+        if self.parallel and len(self.evaluators) > 1:
+            self._evaluate_in_parallel(reference, input_text, results)
+            return results
+        
         # Run each evaluator and collect results
         for evaluator in self.evaluators:
             evaluator_name = evaluator.__class__.__name__
             # Extract the type name from class (e.g., DimensionEvaluator -> dimension)
-            evaluator_type = evaluator_name.replace('Evaluator', '').lower()
+            evaluator_type = self._get_evaluator_type(evaluator)
             
             try:
                 # Run this evaluator
@@ -54,3 +101,89 @@ class MultiEvaluator(BaseEvaluator):
                 }
         
         return results
+    
+    def _evaluate_in_parallel(self, reference: str, input_text: str, results: Dict[str, Any]):
+        """
+        Run all evaluators at the same time, each in a thread or a worker process.
+        
+        Args:
+            reference: Reference text
+            input_text: Input text to evaluate
+            results: Aggregated results, filled in place
+        """
+        thread_count = sum(1 for executor in self.executors.values() if executor == 'thread')
+        
+        with ThreadPoolExecutor(max_workers=max(1, thread_count)) as thread_pool:
+            futures = []
+            for evaluator in self.evaluators:
+                evaluator_type = self._get_evaluator_type(evaluator)
+                try:
+                    if self.executors[evaluator_type] == 'process':
+                        future = self._get_process_pool().submit(_run_evaluator, evaluator_type, reference, input_text)
+                    else:
+                        future = thread_pool.submit(evaluator.evaluate, reference, input_text)
+                except Exception as e:
+                    future = e
+                futures.append((evaluator, future))
+            
+            # Collect in configuration order, isolating each evaluator's errors
+            for evaluator, future in futures:
+                evaluator_name = evaluator.__class__.__name__
+                evaluator_type = self._get_evaluator_type(evaluator)
+                try:
+                    if isinstance(future, Exception):
+                        raise future
+                    results['results'][evaluator_type] = future.result()
+                    print(f"Completed evaluation with {evaluator_name}")
+                except Exception as e:
+                    print(f"Error running {evaluator_name}: {e}")
+                    results['results'][evaluator_type] = {
+                        'error': str(e),
+                        'evaluator_type': evaluator_type
+                    }
+    
+    def use_worker_processes(self, max_workers: int):
+        """
+        Run the children with a process executor in worker processes even without parallel: true.
+        
+        Used when several file pairs are evaluated at once by threads, so the CPU-bound
+        evaluators (BLEU/ROUGE) of different pairs do not contend for the GIL.
+        
+        Args:
+            max_workers: Number of pairs evaluated at once
+        """
+        self.parallel = True
+        self.process_workers = max_workers
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """
+        Get the pool of worker processes, starting it on first use.
+        
+        Each worker creates its own evaluators of the process types once, so only
+        the texts are sent per pair and state such as tokenization caches is kept.
+        Workers are spawned rather than forked, since the pool may be started from
+        a thread while other threads hold locks.
+        """
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                process_types = [evaluator_type for evaluator_type, executor in self.executors.items() if executor == 'process']
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=min(len(process_types) * (self.process_workers or 1), os.cpu_count() or 1),
+                    initializer=_init_worker_evaluators,
+                    initargs=(self.config, process_types),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._process_pool
+    
+    def close(self):
+        """Shut down the worker processes and close the child evaluators."""
+        with self._process_pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+        for evaluator in self.evaluators:
+            evaluator.close()
+    
+    def _get_evaluator_type(self, evaluator: BaseEvaluator) -> str:
+        """Extract the type name from the evaluator class (e.g., DimensionEvaluator -> dimension)."""
+        return evaluator.__class__.__name__.replace('Evaluator', '').lower()
@@ -0,0 +1,247 @@
+import re
+import functools
+from collections import Counter
+from typing import Dict, Any, List, Optional, Sequence
+
+# Distinct words whose Porter stems are kept in memory
+STEM_CACHE_SIZE = 100000
+
+@functools.lru_cache(maxsize=None)
+def _porter_stemmer():
+    """The Porter stemmer rouge_score uses, created on first use."""
+    from nltk.stem import porter
+    return porter.PorterStemmer()
+
+@functools.lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word: str) -> str:
+    """Porter stem of a word, memoized across sentences and evaluations."""
+    return _porter_stemmer().stem(word)
+
+class _CachedStemmer:
+    """Stemmer passed to rouge_score's tokenizer, backed by the memoized stem."""
+    
+    def stem(self, word: str) -> str:
+        return stem(word)
+
+class LcsIndex:
+    """
+    Computes the LCS length of a sentence against many sentences at once, with a bit-parallel algorithm.
+    
+    The indexed sentences are laid end to end in one Python int, one bit per token,
+    with a zero guard bit after each sentence. Hyyro's bit-vector LCS then takes
+    one addition and a few bitwise operations per token of the other sentence, for
+    all indexed sentences together, instead of filling a DP table per pair; the
+    guard bits absorb the carries so the sentences do not interfere.
+    """
+    
+    def __init__(self, sentences: Sequence[Sequence[int]]):
+        """
+        Build the match masks of the sentences.
+        
+        Args:
+            sentences: Token ids of each sentence to index
+        """
+        self.bounds = []
+        # Bits of each token id: one at every position where an indexed sentence has it
+        self.match_masks: Dict[int, int] = {}
+        offset = 0
+        for token_ids in sentences:
+            for position, token_id in enumerate(token_ids, offset):
+                self.match_masks[token_id] = self.match_masks.get(token_id, 0) | (1 << position)
+            self.bounds.append((offset, offset + len(token_ids)))
+            offset += len(token_ids) + 1
+        self.width = offset
+        # Every token bit set, guard bits cleared
+        self.tokens_mask = sum(((1 << (end - start)) - 1) << start for start, end in self.bounds)
+    
+    def lengths(self, token_ids: Sequence[int]) -> List[int]:
+        """
+        Compute the LCS length of a sentence with each indexed sentence.
+        
+        Args:
+            token_ids: Token ids of the sentence
+        
+        Returns:
+            LCS length with each indexed sentence, in index order
+        """
+        # Cleared bits of vector mark the rows of the DP table where the LCS grows
+        vector = self.tokens_mask
+        for token_id in token_ids:
+            matches = vector & self.match_masks.get(token_id, 0)
+            if matches:
+                # matches is a subset of vector, so vector - matches never borrows
+                vector = ((vector + matches) | (vector - matches)) & self.tokens_mask
+        
+        # Bit i of vector is character i of the reversed binary string
+        bits = format(vector, f"0{self.width}b")[::-1] if self.width else ''
+        return [bits.count('0', start, end) for start, end in self.bounds]
+
+def lcs_length(first: Sequence[int], second: Sequence[int]) -> int:
+    """
+    Length of the longest common subsequence of two token id sequences.
+    
+    Args:
+        first: Token ids of one sentence
+        second: Token ids of the other sentence
+    
+    Returns:
+        LCS length, equal to the last cell of rouge_score's LCS table
+    """
+    return LcsIndex([first]).lengths(second)[0]
+
+class RougeSentence:
+    """Token ids and n-gram counts of a sentence, computed once and reused for every comparison."""
+    
+    __slots__ = ('text', 'token_ids', 'ngrams')
+    
+    def __init__(self, text: str, token_ids: List[int], orders: Sequence[int]):
+        """
+        Count the n-grams of a tokenized sentence.
+        
+        Args:
+            text: Text of the sentence, for ROUGE types scored by rouge_score itself
+            token_ids: Interned ids of the sentence's tokens
+            orders: N-gram orders to count
+        """
+        self.text = text
+        self.token_ids = token_ids
+        self.ngrams = {n: Counter(zip(*(token_ids[i:] for i in range(n)))) for n in orders}
+
+class RougeEngine:
+    """
+    Computes the scores of rouge_score.rouge_scorer.RougeScorer from sentences prepared once.
+    
+    Each sentence is tokenized and stemmed once by prepare, with its tokens interned
+    to integer ids. ROUGE-N then compares precomputed n-gram counts and ROUGE-L
+    computes the LCS with a bit-parallel algorithm on the ids. Other ROUGE types (e.g. rougeLsum) are delegated to
+    RougeScorer.
+    """
+    
+    def __init__(self, rouge_types: List[str], use_stemmer: bool = False):
+        """
+        Initialize with the ROUGE types to compute.
+        
+        Args:
+            rouge_types: ROUGE types, as accepted by RougeScorer
+            use_stemmer: Whether to Porter-stem tokens longer than 3 characters
+        """
+        self.rouge_types = list(rouge_types)
+        self.use_stemmer = use_stemmer
+        self.orders = []
+        delegated = []
+        for rouge_type in self.rouge_types:
+            if re.match(r"rouge[0-9]$", rouge_type):
+                n = int(rouge_type[5:])
+                if n <= 0:
+                    raise ValueError(f"rougen requires positive n: {rouge_type}")
+                self.orders.append(n)
+            elif rouge_type != 'rougeL':
+                delegated.append(rouge_type)
+        
+        self._stemmer = _CachedStemmer() if use_stemmer else None
+        self._scorer = None
+        if delegated:
+            from rouge_score import rouge_scorer
+            self._scorer = rouge_scorer.RougeScorer(delegated, use_stemmer=use_stemmer)
+        # Integer id of each token seen by this engine
+        self.vocabulary: Dict[str, int] = {}
+    
+    def prepare(self, text: str) -> RougeSentence:
+        """
+        Tokenize, stem and count a sentence for scoring.
+        
+        Args:
+            text: Sentence or text to prepare
+        
+        Returns:
+            Prepared sentence
+        """
+        from rouge_score import tokenize
+        tokens = tokenize.tokenize(text, self._stemmer)
+        token_ids = [self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens]
+        return RougeSentence(text, token_ids, self.orders)
+    
+    def index(self, targets: Sequence[RougeSentence]) -> LcsIndex:
+        """
+        Build the LCS index of prepared sentences, to score many predictions against them.
+        
+        Args:
+            targets: Prepared target (reference) sentences
+        
+        Returns:
+            LCS index of the sentences' token ids
+        """
+        return LcsIndex([target.token_ids for target in targets])
+    
+    def score(self, target: RougeSentence, prediction: RougeSentence) -> Dict[str, Any]:
+        """
+        Calculate the ROUGE scores of a prediction against a target.
+        
+        Args:
+            target: Prepared target (reference) sentence
+            prediction: Prepared predicted (input) sentence
+        
+        Returns:
+            Dictionary mapping each ROUGE type to a rouge_score Score, identical
+            to RougeScorer.score(target.text, prediction.text)
+        """
+        return self.score_all([target], prediction)[0]
+    
+    def score_all(self, targets: Sequence[RougeSentence], prediction: RougeSentence,
+                  lcs_index: Optional[LcsIndex] = None) -> List[Dict[str, Any]]:
+        """
+        Calculate the ROUGE scores of a prediction against each of several targets.
+        
+        The ROUGE-L LCS lengths of all targets are computed in one bit-parallel pass
+        over the prediction's tokens.
+        
+        Args:
+            targets: Prepared target (reference) sentences
+            prediction: Prepared predicted (input) sentence
+            lcs_index: Index of the targets from index(targets), to build it only
+                once for many predictions
+        
+        Returns:
+            Scores against each target, as returned by score
+        """
+        from rouge_score import scoring
+        if 'rougeL' in self.rouge_types:
+            if lcs_index is None:
+                lcs_index = self.index(targets)
+            lcs_lengths = lcs_index.lengths(prediction.token_ids)
+        else:
+            lcs_lengths = [0] * len(targets)
+        
+        results = []
+        for target, lcs in zip(targets, lcs_lengths):
+            delegated = self._scorer.score(target.text, prediction.text) if self._scorer else {}
+            
+            result = {}
+            for rouge_type in self.rouge_types:
+                if rouge_type in delegated:
+                    result[rouge_type] = delegated[rouge_type]
+                    continue
+                
+                if rouge_type == 'rougeL':
+                    if not target.token_ids or not prediction.token_ids:
+                        result[rouge_type] = scoring.Score(precision=0, recall=0, fmeasure=0)
+                        continue
+                    matches = lcs
+                    prediction_count = len(prediction.token_ids)
+                    target_count = len(target.token_ids)
+                else:
+                    n = int(rouge_type[5:])
+                    target_ngrams = target.ngrams[n]
+                    prediction_ngrams = prediction.ngrams[n]
+                    smaller, larger = sorted((target_ngrams, prediction_ngrams), key=len)
+                    matches = sum(min(count, larger.get(ngram, 0)) for ngram, count in smaller.items())
+                    prediction_count = max(len(prediction.token_ids) - n + 1, 1)
+                    target_count = max(len(target.token_ids) - n + 1, 1)
+                
+                precision = matches / prediction_count
+                recall = matches / target_count
+                result[rouge_type] = scoring.Score(
+                    precision=precision, recall=recall, fmeasure=scoring.fmeasure(precision, recall)
+                )
+            results.append(result)
+        return results
@@ -95,8 +95,8 @@ class ROUGEEvaluator(BaseEvaluator):
             return self._fallback_rouge(reference, input_text)
         
         try:
-            # Import rouge-score here to avoid loading it during initialization
-            from rouge_score import rouge_scorer
+            # Import the engine here to avoid loading rouge-score during initialization
+            from .rouge_engine import RougeEngine
             
             # Tokenize the texts into sentences
             reference_sentences_raw = self._tokenize_into_sentences(reference)
@@ -106,18 +106,19 @@ class ROUGEEvaluator(BaseEvaluator):
             reference_sentences_clean = [self.remove_stopwords_rouge(sent) for sent in reference_sentences_raw]
             input_sentences_clean = [self.remove_stopwords_rouge(sent) for sent in input_sentences_raw]
             
-            # Set up the ROUGE scorer
-            scorer = rouge_scorer.RougeScorer(
-                self.rouge_types, 
-                use_stemmer=self.use_stemmer
-            )
+            # Set up the ROUGE engine, which gives the scores of rouge_score's RougeScorer
+            engine = RougeEngine(self.rouge_types, use_stemmer=self.use_stemmer)
+            
+            # Tokenize and stem every reference sentence once, for all input sentences
+            reference_sentences = [engine.prepare(sent) for sent in reference_sentences_clean]
+            reference_index = engine.index(reference_sentences)
 
             # Get rid of stopwords for the entire text
             reference = self.remove_stopwords_rouge(reference)
             input_text = self.remove_stopwords_rouge(input_text)
             
             # Calculate ROUGE for the entire text
-            overall_scores = scorer.score(reference, input_text)
+            overall_scores = engine.score(engine.prepare(reference), engine.prepare(input_text))
             
             # Convert scores to a more JSON-friendly format
             overall_dict = {}
@@ -133,6 +134,9 @@ class ROUGEEvaluator(BaseEvaluator):
             
             for i, input_sent_clean in enumerate(input_sentences_clean):
                 input_sent_raw = input_sentences_raw[i]
+                input_sentence = engine.prepare(input_sent_clean)
+                # Scores against every reference sentence, with one LCS pass over all of them
+                input_scores = engine.score_all(reference_sentences, input_sentence, reference_index)
                 
                 best_score = {rouge_type: {'fmeasure': 0, 'precision': 0, 'recall': 0} for rouge_type in self.rouge_types}
                 best_reference = {rouge_type: None for rouge_type in self.rouge_types}
@@ -140,7 +144,7 @@ class ROUGEEvaluator(BaseEvaluator):
                 
                 for j, reference_sent_clean in enumerate(reference_sentences_clean):
                     reference_sent_raw = reference_sentences_raw[j]
-                    sent_scores = scorer.score(reference_sent_clean, input_sent_clean)
+                    sent_scores = input_scores[j]
 
                     for rouge_type in self.rouge_types:
                         sent_score = sent_scores[rouge_type]
@@ -0,0 +1,141 @@
+import json
+import asyncio
+import importlib
+import threading
+import weakref
+from typing import Dict, Any, Optional
+
+def _client_settings(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Read the connection settings of the http_client section.
+    
+    Args:
+        config: Global application configuration
+    
+    Returns:
+        Connection settings, or None if the shared client is disabled
+    """
+    http_config = config.get('http_client', {})
+    if not http_config.get('enabled', False):
+        return None
+    
+    return {
+        'max_connections': http_config.get('max_connections', 100),
+        'max_keepalive_connections': http_config.get('max_keepalive_connections', 20),
+        'keepalive_expiry': http_config.get('keepalive_expiry', 30.0),  # Seconds an idle connection is kept open
+        'timeout': http_config.get('timeout', 600.0),  # Read, write and pool timeout in seconds
+        'connect_timeout': http_config.get('connect_timeout', 10.0),
+        'http2': http_config.get('http2', False)
+    }
+
+def _http_library(client_class: type) -> str:
+    """Name of the HTTP library (httpx or its successor) an SDK's client class derives from."""
+    sdk = client_class.__module__.partition('.')[0]
+    for cls in client_class.__mro__:
+        library = cls.__module__.partition('.')[0]
+        if library != sdk:
+            return library
+    return sdk
+
+def _create_client(client_class: type, library: str, settings: Dict[str, Any]):
+    """
+    Create a client with the connection settings.
+    
+    Args:
+        client_class: Client class of an SDK, e.g. anthropic.DefaultHttpxClient
+        library: HTTP library of the class, whose Limits and Timeout are used
+        settings: Connection settings
+    
+    Returns:
+        The new client
+    """
+    http = importlib.import_module(library)
+    kwargs = {
+        'limits': http.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry']
+        ),
+        'timeout': http.Timeout(settings['timeout'], connect=settings['connect_timeout']),
+        'http2': settings['http2']
+    }
+    try:
+        return client_class(**kwargs)
+    except ImportError:
+        # HTTP/2 support is an optional extra of the HTTP library
+        print(f"HTTP/2 support is not installed (pip install '{library}[http2]'); using HTTP/1.1")
+        kwargs['http2'] = False
+        return client_class(**kwargs)
+
+# Process-wide registry of shared clients, one per HTTP library and configuration
+_clients: Dict[str, Any] = {}
+# Async clients hold connections bound to the event loop that opened them, so they are shared per loop
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]' = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def get_http_client(config: Dict[str, Any], client_class: type):
+    """
+    Get the HTTP client shared by the LLM API clients, if enabled.
+    
+    One connection pool serves every provider SDK built on the same HTTP library,
+    so connections are kept alive and reused across calls and providers instead
+    of being opened per SDK client.
+    
+    Args:
+        config: Global application configuration
+        client_class: Default HTTP client class of the calling SDK, used if the
+            shared client does not exist yet
+    
+    Returns:
+        The shared client, or None (http_client disabled) to let the SDK create its own
+    """
+    settings = _client_settings(config)
+    if settings is None:
+        return None
+    
+    library = _http_library(client_class)
+    key = f"{library}:{json.dumps(settings, sort_keys=True)}"
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _create_client(client_class, library, settings)
+        return _clients[key]
+
+def get_async_http_client(config: Dict[str, Any], client_class: type):
+    """
+    Get the async HTTP client shared by the async LLM API clients of the running event loop.
+    
+    Connections are bound to the loop that opened them, so each loop has its own
+    pool; an async run that starts a loop per evaluation gets a pool per evaluation.
+    
+    Args:
+        config: Global application configuration
+        client_class: Default async HTTP client class of the calling SDK
+    
+    Returns:
+        The shared async client, or None to let the SDK create its own
+    """
+    settings = _client_settings(config)
+    if settings is None:
+        return None
+    
+    library = _http_library(client_class)
+    key = f"{library}:{json.dumps(settings, sort_keys=True)}"
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        if key not in loop_clients:
+            loop_clients[key] = _create_client(client_class, library, settings)
+        return loop_clients[key]
+
+async def close_async_http_clients():
+    """
+    Close the async HTTP clients of the running event loop.
+    
+    Must be awaited before the loop ends, since a loop's pool cannot be reused
+    by another loop and would otherwise keep its sockets open.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        loop_clients = _async_clients.pop(loop, {})
+    for client in loop_clients.values():
+        await client.aclose()
@@ -1,5 +1,5 @@
 from typing import Dict, Any
-from .base import LLMApi
+from .base import LLMApi, PrefixedPrompt
 from .claude import ClaudeApi
 from .chatgpt import ChatGPTApi
 from .gemini import GeminiApi
@@ -1,10 +1,62 @@
+import re
+import asyncio
+import threading
+import weakref
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from ..throttling_manager import ThrottlingManager
+from ..response_cache import ResponseCache, ResponseCacheMiss, get_response_cache
+
+# A standalone score from 1 to 5; digits of ranges ("1-5"), fractions' denominators ("/5")
+# and longer or decimal numbers are not scores. List markers ("1. Read", "2) Compare") and
+# step numbers ("Step 2:") are matched by the first alternatives, without a score group
+SCORE_PATTERN = re.compile(
+    r"^[ \t]*[1-5][.)][ \t]|\bstep\s+[1-5]\b|(?<![\w.\-–/])([1-5])(?!\w|\.\d|\s*[-–])",
+    re.IGNORECASE | re.MULTILINE
+)
+
+def extract_score(text: str, complete: bool = True) -> Optional[str]:
+    """
+    Find the score in the text of a score-only completion.
+    
+    Args:
+        text: Completion text, possibly still being streamed
+        complete: Whether the text is final; a digit at the end of a partial text
+            is not a score yet, since the next token may extend it (e.g. to "1-5" or "1. ")
+        
+    Returns:
+        The first score as a string, or None if there is none (yet)
+    """
+    match = next((match for match in SCORE_PATTERN.finditer(text) if match.group(1)), None)
+    if match is None or (not complete and text[match.end():] in ('', '.', ')')):
+        return None
+    return match.group(1)
+
+class PrefixedPrompt(str):
+    """
+    A prompt made of a prefix shared by many prompts and a prompt-specific suffix.
+    
+    It is the full prompt text everywhere a string is expected; APIs with
+    prompt caching send the prefix as a separately cacheable block.
+    """
+    
+    def __new__(cls, prefix: str, suffix: str):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix = prefix
+        prompt.suffix = suffix
+        return prompt
+    
+    def __getnewargs__(self):
+        """Rebuild from prefix and suffix when unpickled, e.g. in a worker process."""
+        return (self.prefix, self.suffix)
 
 class LLMApi(ABC):
     """Base class for LLM API interactions."""
     
+    # Output token limit used when the configuration does not set max_tokens
+    default_max_tokens = 1000
+    
     def __init__(self, config: Dict[str, Any], global_config: Dict[str, Any] = None):
         """
         Initialize with configuration.
@@ -16,20 +68,45 @@ class LLMApi(ABC):
         self.api_key = config.get('api_key', '')
         self.model = config.get('model', '')
         self.api_url = config.get('api_url', '')
+        self.base_url = config.get('base_url')  # Alternative SDK endpoint (proxy, local fake server); None = provider default
         self.num_completions = config.get('num_completions', 1)
+        self.max_tokens = config.get('max_tokens', self.default_max_tokens)
         self.name = config.get('name', self.__class__.__name__)
         
         # Initialize throttling manager
         if global_config is None:
             global_config = {}
+        self.global_config = global_config
         self.throttling_manager = ThrottlingManager(global_config)
         
-        # Apply throttling to internal _generate method
+        # Apply throttling to internal _generate method. Providers that send one request
+        # per completion throttle each request instead and set this to the bare _generate,
+        # which only fans the requests out and is not throttled as a whole
         self._generate_with_throttling = self.throttling_manager.with_throttling(
             self._generate,
             llm_name=self.name,
-            llm_config=config
+            llm_config=config,
+            estimate_tokens=self._estimate_tokens
+        )
+        self._stream_score_with_throttling = self.throttling_manager.with_throttling(
+            self._stream_score,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_score_tokens
         )
+        
+        # Persistent response cache; in replay mode a miss is an error instead of an API call
+        self.response_cache = get_response_cache(global_config)
+        self.replay = global_config.get('response_cache', {}).get('replay', False)
+        
+        # Provider prompt cache usage per prompt, until collected by the evaluator (if tracked)
+        self.track_prompt_cache = False
+        self.prompt_cache_usage = {}
+        self._prompt_cache_lock = threading.Lock()
+        
+        # Async SDK clients by event loop, since their connections are bound to the loop that opened them
+        self._async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]' = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
     
     @abstractmethod
     def _generate(self, prompt: str) -> List[str]:
@@ -45,6 +122,64 @@ class LLMApi(ABC):
         """
         pass
     
+    def pop_prompt_cache_usage(self, prompt: str) -> Optional[Dict[str, int]]:
+        """
+        Collect the provider prompt cache usage of the calls made for a prompt.
+        
+        Args:
+            prompt: The prompt sent to the LLM
+            
+        Returns:
+            Dictionary with input_tokens, cache_read_input_tokens and
+            cache_creation_input_tokens, or None if the provider reported none
+        """
+        with self._prompt_cache_lock:
+            return self.prompt_cache_usage.pop(prompt, None)
+    
+    def _record_prompt_cache_usage(self, prompt: str, input_tokens: int,
+                                   cache_read_input_tokens: int, cache_creation_input_tokens: int = 0):
+        """Add the input token usage of one call to the prompt's totals."""
+        if not self.track_prompt_cache:
+            return
+        with self._prompt_cache_lock:
+            usage = self.prompt_cache_usage.setdefault(prompt, {
+                'input_tokens': 0,
+                'cache_read_input_tokens': 0,
+                'cache_creation_input_tokens': 0
+            })
+            usage['input_tokens'] += input_tokens
+            usage['cache_read_input_tokens'] += cache_read_input_tokens
+            usage['cache_creation_input_tokens'] += cache_creation_input_tokens
+    
+    def get_model_name(self) -> str:
+        """Returns the name of the model the requests are sent to."""
+        return self.model
+    
+    def _sampling_params(self) -> Dict[str, Any]:
+        """
+        Sampling parameters sent with each request, part of the response cache key.
+        
+        Subclasses that send more parameters should override this and build
+        their requests from it, so a parameter change invalidates cached responses.
+        """
+        return {'max_tokens': self.max_tokens}
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        """
+        Estimate the input plus output tokens a _generate call will use, for token budgeting.
+        
+        Assumes about four characters per prompt token and that every completion
+        uses its full max_tokens; the throttling manager corrects the estimate
+        with the usage reported in the responses.
+        
+        Args:
+            prompt: The prompt to send to the LLM
+            
+        Returns:
+            Estimated number of tokens
+        """
+        return (len(prompt) // 4 + self.max_tokens) * self.num_completions
+    
     def generate(self, prompt: str) -> List[str]:
         """
         Generate one or more responses from the LLM with throttling applied.
@@ -56,5 +191,216 @@ class LLMApi(ABC):
             A list of responses from the LLM. The length of the list will be
             determined by the num_completions configuration, but may be less
             if the API cannot generate the requested number of completions.
+            
+        Raises:
+            ResponseCacheMiss: In replay mode, if the responses are not cached
+        """
+        keys, cached = self._lookup_cache(prompt)
+        if cached is not None:
+            return cached
+        
+        responses = self._generate_with_throttling(prompt)
+        self._store_cache(keys, responses)
+        return responses
+    
+    async def agenerate(self, prompt: str) -> List[str]:
+        """
+        Generate one or more responses from the LLM without blocking the event loop.
+        
+        Many calls can be awaited together from one thread; throttling and the
+        response cache apply as in generate.
+        
+        Args:
+            prompt: The prompt to send to the LLM
+            
+        Returns:
+            A list of responses from the LLM, as returned by generate
+            
+        Raises:
+            ResponseCacheMiss: In replay mode, if the responses are not cached
+        """
+        keys, cached = self._lookup_cache(prompt)
+        if cached is not None:
+            return cached
+        
+        responses = await self._agenerate(prompt)
+        self._store_cache(keys, responses)
+        return responses
+    
+    async def _agenerate(self, prompt: str) -> List[str]:
+        """
+        Internal coroutine to generate responses from the LLM, with throttling applied.
+        
+        Subclasses with an async SDK client should override this; the default
+        runs the synchronous, throttled _generate in a worker thread.
+        
+        Args:
+            prompt: The prompt to send to the LLM
+            
+        Returns:
+            A list of responses from the LLM
         """
-        return self._generate_with_throttling(prompt)
+        return await asyncio.to_thread(self._generate_with_throttling, prompt)
+    
+    def generate_score(self, prompt: str, max_tokens: int) -> List[str]:
+        """
+        Generate score-only responses, each stopped as soon as it contains a score.
+        
+        Each completion is streamed and the stream is closed at the first score
+        from 1 to 5, so no time or output tokens are spent on the rest of the text.
+        Throttling and the response cache apply as in generate.
+        
+        Args:
+            prompt: A prompt asking for a score from 1 to 5
+            max_tokens: Output token limit of each completion
+            
+        Returns:
+            The score of each completion as a string, or the full completion
+            text if it contains no score
+            
+        Raises:
+            ResponseCacheMiss: In replay mode, if the responses are not cached
+        """
+        keys, cached = self._lookup_cache(prompt, self._score_params(max_tokens))
+        if cached is not None:
+            return cached
+        
+        responses = self._generate_scores(prompt, max_tokens)
+        self._store_cache(keys, responses)
+        return responses
+    
+    async def agenerate_score(self, prompt: str, max_tokens: int) -> List[str]:
+        """Generate score-only responses as in generate_score, in a worker thread."""
+        return await asyncio.to_thread(self.generate_score, prompt, max_tokens)
+    
+    def _generate_scores(self, prompt: str, max_tokens: int) -> List[str]:
+        """
+        Stream the completions of a score-only prompt concurrently, each throttled on its own.
+        
+        APIs that stream several completions in one request override this instead of _stream_score.
+        
+        Args:
+            prompt: A prompt asking for a score
+            max_tokens: Output token limit of each completion
+            
+        Returns:
+            The score of each completion
+        """
+        if self.num_completions > 1:
+            with ThreadPoolExecutor(max_workers=self.num_completions) as executor:
+                return list(executor.map(
+                    lambda i: self._stream_score_with_throttling(prompt, i, max_tokens), range(self.num_completions)
+                ))
+        return [self._stream_score_with_throttling(prompt, 0, max_tokens)]
+    
+    def _stream_score(self, prompt: str, index: int, max_tokens: int) -> str:
+        """
+        Stream a single completion until it contains a score.
+        
+        Args:
+            prompt: A prompt asking for a score
+            index: Index of the completion among the num_completions requested
+            max_tokens: Output token limit of the completion
+            
+        Returns:
+            The score, or the full completion text if it contains none
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not stream completions")
+    
+    def _score_params(self, max_tokens: int) -> Dict[str, Any]:
+        """Parameters of score-only requests, part of their response cache key."""
+        return {**self._sampling_params(), 'score_max_tokens': max_tokens}
+    
+    def _estimate_score_tokens(self, prompt: str, index: int, max_tokens: int) -> int:
+        """Estimate the input plus output tokens of a single score-only completion."""
+        return len(prompt) // 4 + max_tokens
+    
+    def _sdk_max_retries(self, sdk_default: int) -> int:
+        """
+        Number of retries the provider SDK client should make on its own.
+        
+        The throttling manager retries and adapts its rate on 429s, so while it is
+        enabled the SDK must not retry the same errors itself.
+        
+        Args:
+            sdk_default: The SDK's default number of retries
+            
+        Returns:
+            0 with throttling enabled, otherwise the SDK default
+        """
+        return 0 if self.throttling_manager.enabled else sdk_default
+    
+    def _get_async_client(self):
+        """
+        Get the async SDK client for the running event loop.
+        
+        Async clients hold connections bound to the loop that opened them, so each
+        loop gets its own client; threads running their own loops at the same time
+        never use each other's client.
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            if loop not in self._async_clients:
+                self._async_clients[loop] = self._create_async_client()
+            return self._async_clients[loop]
+    
+    async def aclose(self):
+        """
+        Close the async SDK client of the running event loop, if one was created.
+        
+        Must be awaited before the loop ends (e.g. at the end of the coroutine
+        given to asyncio.run), so the client's connections are released.
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+    
+    def _create_async_client(self):
+        """Create the async SDK client; implemented by subclasses that override _agenerate."""
+        raise NotImplementedError(f"{self.__class__.__name__} has no async client")
+    
+    def _lookup_cache(self, prompt: str, params: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Optional[List[str]]]:
+        """
+        Look up the responses to a prompt in the response cache.
+        
+        Args:
+            prompt: The prompt to send to the LLM
+            params: Request parameters of the key (default: the sampling parameters)
+            
+        Returns:
+            Tuple of (cache key of each completion, cached responses or None on a miss)
+            
+        Raises:
+            ResponseCacheMiss: In replay mode, if the responses are not cached
+        """
+        if self.response_cache is None:
+            return [], None
+        
+        if params is None:
+            params = self._sampling_params()
+        
+        # Each completion is cached separately under its index
+        keys = [
+            ResponseCache.make_key(self.name, self.get_model_name(), prompt, params, i)
+            for i in range(self.num_completions)
+        ]
+        cached = [self.response_cache.get(key) for key in keys]
+        if all(response is not None for response in cached):
+            return keys, cached
+        
+        if self.replay:
+            raise ResponseCacheMiss(
+                f"No cached response from {self.name} ({self.get_model_name()}) for this prompt in replay mode"
+            )
+        return keys, None
+    
+    def _store_cache(self, keys: List[str], responses: List[str]):
+        """Store freshly generated responses in the response cache."""
+        if self.response_cache is None:
+            return
+        for key, response in zip(keys, responses):
+            # Error placeholders are returned to the caller but never replayed
+            if isinstance(response, str) and not response.startswith("Error:"):
+                self.response_cache.put(key, response)
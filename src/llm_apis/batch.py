@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Tuple
+from .base import LLMApi
+
+class BatchBackend(ABC):
+    """
+    Submits many prompts at once through a provider's asynchronous batch API.
+    
+    Batches trade latency (results may take up to a day) for throughput and the
+    batch-tier discount. Responses already in the response cache are not resubmitted,
+    and fresh ones are added to it.
+    """
+    
+    def __init__(self, llm_api: LLMApi, config: Dict[str, Any]):
+        """
+        Initialize with the LLM API whose client and request parameters are used.
+        
+        Args:
+            llm_api: LLM API instance
+            config: Global application configuration
+        """
+        self.llm_api = llm_api
+        batch_config = config.get('batch', {})
+        self.poll_interval = batch_config.get('poll_interval', 60)  # Seconds between status checks
+        self.max_wait = batch_config.get('max_wait_hours', 24) * 3600
+        # Ids of submitted batches, so a crashed or interrupted run resumes them instead of resubmitting
+        self.state_dir = batch_config.get('state_dir', '.cache/batches')
+        
+        # The SDK clients do not retry under throttling, so the batch endpoints are retried here
+        throttling_manager = llm_api.throttling_manager
+        self._submit = throttling_manager.with_throttling(self.submit, llm_name=llm_api.name)
+        self._poll = throttling_manager.with_throttling(self.poll, llm_name=llm_api.name)
+        self._collect = throttling_manager.with_throttling(self.collect, llm_name=llm_api.name)
+    
+    def generate_all(self, prompts: List[str]) -> Dict[str, List[str]]:
+        """
+        Generate the responses to all prompts with one batch.
+        
+        Args:
+            prompts: Rendered prompts
+        
+        Returns:
+            Dictionary mapping each prompt to its list of responses; prompts
+            whose batch request failed are left out, to be generated live
+        """
+        responses = {}
+        cache_keys = {}
+        pending = []
+        for prompt in dict.fromkeys(prompts):
+            keys, cached = self.llm_api._lookup_cache(prompt)
+            if cached is not None:
+                responses[prompt] = cached
+            else:
+                cache_keys[prompt] = keys
+                pending.append(prompt)
+        
+        if responses:
+            print(f"{len(responses)} prompts answered from the response cache")
+        if not pending:
+            return responses
+        
+        state_path = self._state_path(pending)
+        batch_id = self._load_batch_id(state_path)
+        if batch_id is not None:
+            print(f"Resuming batch {batch_id} with {len(pending)} prompts to {self.llm_api.name} ({state_path})")
+        else:
+            batch_id = self._submit(pending)
+            self._save_batch_id(state_path, batch_id)
+            print(f"Submitted batch {batch_id} with {len(pending)} prompts to {self.llm_api.name} (saved in {state_path})")
+        
+        start_time = time.monotonic()
+        while True:
+            ended, status = self._poll(batch_id)
+            if ended:
+                break
+            elapsed = time.monotonic() - start_time
+            if elapsed > self.max_wait:
+                raise TimeoutError(f"Batch {batch_id} did not end within {elapsed / 3600:.1f} hours ({status})")
+            print(f"Batch {batch_id}: {status} (elapsed {elapsed:.0f}s)")
+            time.sleep(self.poll_interval)
+        
+        results = self._collect(batch_id, pending)
+        self._remove_batch_id(state_path)
+        failed = 0
+        for prompt in pending:
+            prompt_responses = results.get(prompt) or ["Error: No response in batch results"]
+            if any(response.startswith("Error:") for response in prompt_responses):
+                # Not returned, so the evaluation makes a live call for this prompt instead
+                failed += 1
+                continue
+            responses[prompt] = prompt_responses
+            self.llm_api._store_cache(cache_keys[prompt], prompt_responses)
+        
+        print(f"Batch {batch_id} ended: {len(pending) - failed} prompts succeeded, {failed} failed and will be generated live")
+        return responses
+    
+    def _state_path(self, prompts: List[str]) -> str:
+        """Path of the file holding the id of the batch submitted for these prompts."""
+        # Request ids are prompt positions, so a batch is only resumed for the same prompts in the same order
+        content = json.dumps([self.llm_api.get_model_name(), self.llm_api.num_completions, prompts])
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.state_dir, f"{self.llm_api.name.lower()}-{digest}.json")
+    
+    def _load_batch_id(self, state_path: str) -> Optional[str]:
+        """Read the id of a batch submitted by an earlier run, if any."""
+        try:
+            with open(state_path) as f:
+                return json.load(f)['batch_id']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Ignoring unreadable batch state {state_path}: {e}")
+            return None
+    
+    def _save_batch_id(self, state_path: str, batch_id: str):
+        """Record a submitted batch until its results are collected."""
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(state_path, 'w') as f:
+                json.dump({'batch_id': batch_id, 'submitted_at': time.time()}, f)
+        except OSError as e:
+            print(f"Warning: Unable to save batch state {state_path}: {e}")
+    
+    def _remove_batch_id(self, state_path: str):
+        """Forget a batch whose results have been collected."""
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+    
+    @abstractmethod
+    def submit(self, prompts: List[str]) -> str:
+        """
+        Submit a batch.
+        
+        Args:
+            prompts: Prompts to generate responses for
+        
+        Returns:
+            Provider identifier of the batch
+        """
+        pass
+    
+    @abstractmethod
+    def poll(self, batch_id: str) -> Tuple[bool, str]:
+        """
+        Check the progress of a batch.
+        
+        Args:
+            batch_id: Provider identifier of the batch
+        
+        Returns:
+            Tuple of (whether the batch has ended, provider status description)
+        """
+        pass
+    
+    @abstractmethod
+    def collect(self, batch_id: str, prompts: List[str]) -> Dict[str, List[str]]:
+        """
+        Download the results of an ended batch.
+        
+        Args:
+            batch_id: Provider identifier of the batch
+            prompts: Prompts of the batch, in submission order
+        
+        Returns:
+            Dictionary mapping each prompt to its responses; failed requests
+            are returned as "Error: ..." responses
+        """
+        pass
+
+class AnthropicBatchBackend(BatchBackend):
+    """Batch backend for the Anthropic Message Batches API."""
+    
+    def submit(self, prompts: List[str]) -> str:
+        """Submit one request per prompt and completion, since Claude returns one completion per request."""
+        requests = [
+            {
+                'custom_id': f"prompt-{j}-{i}",
+                'params': self.llm_api._request_params(prompt, i)
+            }
+            for j, prompt in enumerate(prompts)
+            for i in range(self.llm_api.num_completions)
+        ]
+        return self.llm_api.client.messages.batches.create(requests=requests).id
+    
+    def poll(self, batch_id: str) -> Tuple[bool, str]:
+        """Check the processing status and request counts of a batch."""
+        batch = self.llm_api.client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        status = f"{batch.processing_status}, {counts.succeeded} succeeded, {counts.processing} processing"
+        return batch.processing_status == 'ended', status
+    
+    def collect(self, batch_id: str, prompts: List[str]) -> Dict[str, List[str]]:
+        """Read the succeeded messages and report the other results as errors."""
+        texts = {}
+        for entry in self.llm_api.client.messages.batches.results(batch_id):
+            if entry.result.type == 'succeeded':
+                texts[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                texts[entry.custom_id] = f"Error: Batch request {entry.result.type}"
+        
+        return {
+            prompt: [
+                texts.get(f"prompt-{j}-{i}", "Error: No response in batch results")
+                for i in range(self.llm_api.num_completions)
+            ]
+            for j, prompt in enumerate(prompts)
+        }
+
+class OpenAIBatchBackend(BatchBackend):
+    """Batch backend for the OpenAI Batch API."""
+    
+    endpoint = '/v1/chat/completions'
+    
+    def submit(self, prompts: List[str]) -> str:
+        """Upload the requests as a JSONL file and create a batch over it."""
+        lines = [
+            json.dumps({
+                'custom_id': f"prompt-{j}",
+                'method': 'POST',
+                'url': self.endpoint,
+                'body': self.llm_api._request_params(prompt)
+            })
+            for j, prompt in enumerate(prompts)
+        ]
+        input_file = self.llm_api.client.files.create(
+            file=('batch_requests.jsonl', '\n'.join(lines).encode('utf-8')),
+            purpose='batch'
+        )
+        batch = self.llm_api.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.endpoint,
+            completion_window='24h'
+        )
+        return batch.id
+    
+    def poll(self, batch_id: str) -> Tuple[bool, str]:
+        """Check the status and request counts of a batch."""
+        batch = self.llm_api.client.batches.retrieve(batch_id)
+        status = batch.status
+        if batch.request_counts is not None:
+            status = f"{status}, {batch.request_counts.completed}/{batch.request_counts.total} completed"
+        return batch.status in ('completed', 'failed', 'expired', 'cancelled'), status
+    
+    def collect(self, batch_id: str, prompts: List[str]) -> Dict[str, List[str]]:
+        """Read the output file of a batch; requests missing from it are reported as errors."""
+        batch = self.llm_api.client.batches.retrieve(batch_id)
+        if batch.status != 'completed':
+            print(f"Batch {batch_id} {batch.status}; completed requests are still used")
+        
+        choices = {}
+        if batch.output_file_id:
+            content = self.llm_api.client.files.content(batch.output_file_id).text
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get('response') or {}
+                if response.get('status_code') == 200:
+                    # A choice without content (e.g. a refusal) is an error, not an empty response
+                    choices[entry['custom_id']] = [
+                        choice['message']['content'] if choice['message'].get('content') is not None
+                        else "Error: Batch response without content"
+                        for choice in response['body']['choices']
+                    ]
+                else:
+                    choices[entry['custom_id']] = [f"Error: Batch request failed with status {response.get('status_code')}"]
+        
+        return {
+            prompt: choices.get(f"prompt-{j}", ["Error: No response in batch results"])
+            for j, prompt in enumerate(prompts)
+        }
+
+# Batch backend of each LLM API, by API name
+BATCH_BACKENDS = {
+    'Claude': AnthropicBatchBackend,
+    'ChatGPT': OpenAIBatchBackend
+}
+
+def get_batch_backend(llm_api: LLMApi, config: Dict[str, Any]) -> BatchBackend:
+    """
+    Factory function to get the batch backend of an LLM API.
+    
+    Args:
+        llm_api: LLM API instance
+        config: Global application configuration
+    
+    Returns:
+        A batch backend using the LLM API's client
+    """
+    if llm_api.name not in BATCH_BACKENDS:
+        raise ValueError(f"Batch mode is not supported for {llm_api.name}")
+    return BATCH_BACKENDS[llm_api.name](llm_api, config)
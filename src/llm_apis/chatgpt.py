@@ -1,6 +1,7 @@
 import openai
 from typing import Dict, Any, List
-from .base import LLMApi
+from .base import LLMApi, extract_score
+from ..http_client import get_http_client, get_async_http_client
 
 class ChatGPTApi(LLMApi):
     """API implementation for ChatGPT."""
@@ -10,7 +11,25 @@ class ChatGPTApi(LLMApi):
         # Set the name before calling the parent constructor
         config['name'] = 'ChatGPT'
         super().__init__(config, global_config)
-        self.client = openai.OpenAI(api_key=self.api_key)
+        self.client = openai.OpenAI(
+            api_key=self.api_key, base_url=self.base_url,
+            max_retries=self._sdk_max_retries(openai.DEFAULT_MAX_RETRIES),
+            http_client=get_http_client(self.global_config, openai.DefaultHttpxClient)
+        )
+        
+        self._agenerate_with_throttling = self.throttling_manager.with_async_throttling(
+            self._agenerate_once,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_tokens
+        )
+        # All n choices of a score-only prompt are streamed in one request
+        self._stream_scores_with_throttling = self.throttling_manager.with_throttling(
+            self._stream_scores,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_scores_tokens
+        )
     
     def _generate(self, prompt: str) -> List[str]:
         """
@@ -22,17 +41,128 @@ class ChatGPTApi(LLMApi):
         Returns:
             A list of responses from ChatGPT
         """
+        raw_response = self.client.chat.completions.with_raw_response.create(**self._request_params(prompt))
+        return self._read_response(prompt, raw_response.headers, raw_response.parse())
+    
+    async def _agenerate(self, prompt: str) -> List[str]:
+        """
+        Generate one or more responses from ChatGPT with the async client.
+        
+        Args:
+            prompt: The prompt to send to ChatGPT
+            
+        Returns:
+            A list of responses from ChatGPT
+        """
+        return await self._agenerate_with_throttling(prompt)
+    
+    async def _agenerate_once(self, prompt: str) -> List[str]:
+        """Make the chat completion request with the async client."""
+        raw_response = await self._get_async_client().chat.completions.with_raw_response.create(
+            **self._request_params(prompt)
+        )
+        # The openai raw response parses synchronously, even from the async client
+        return self._read_response(prompt, raw_response.headers, raw_response.parse())
+    
+    def _generate_scores(self, prompt: str, max_tokens: int) -> List[str]:
+        """Stream all choices of a score-only prompt in one throttled request."""
+        return self._stream_scores_with_throttling(prompt, max_tokens)
+    
+    def _stream_scores(self, prompt: str, max_tokens: int) -> List[str]:
+        """
+        Stream the choices of a chat completion until each contains a score.
+        
+        Args:
+            prompt: A prompt asking for a score
+            max_tokens: Output token limit of each choice
+            
+        Returns:
+            The score of each choice, or its full text if it contains none
+        """
+        params = {
+            **self._request_params(prompt),
+            'max_tokens': max_tokens,
+            'stream': True,
+            'stream_options': {'include_usage': True}
+        }
+        texts = [""] * self.num_completions
+        scores = [None] * self.num_completions
+        usage = None
+        stream = self.client.chat.completions.create(**params)
+        try:
+            self.throttling_manager.record_response_headers(stream.response.headers)
+            for chunk in stream:
+                # The usage arrives in a last chunk without choices
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                for choice in chunk.choices:
+                    if choice.delta.content and scores[choice.index] is None:
+                        texts[choice.index] += choice.delta.content
+                        scores[choice.index] = extract_score(texts[choice.index], complete=False)
+                if all(score is not None for score in scores):
+                    break
+        finally:
+            # Closing the connection stops the generation
+            stream.close()
+        
+        if usage is not None:
+            self._record_usage(prompt, usage)
+        else:
+            # Stopped before the usage chunk, so the usage is estimated from the text received
+            self.throttling_manager.record_usage(len(prompt) // 4 + sum(len(text) // 4 for text in texts))
+        
+        return [score or extract_score(text) or text for score, text in zip(scores, texts)]
+    
+    def _estimate_scores_tokens(self, prompt: str, max_tokens: int) -> int:
+        """Estimate tokens for one score-only call of n choices."""
+        return len(prompt) // 4 + max_tokens * self.num_completions
+    
+    def _create_async_client(self):
+        """Create the async OpenAI client, with the same retry policy as the sync one."""
+        return openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, max_retries=self.client.max_retries,
+            http_client=get_async_http_client(self.global_config, openai.DefaultAsyncHttpxClient)
+        )
+    
+    def _request_params(self, prompt: str) -> Dict[str, Any]:
+        """Build the chat completion parameters of a request."""
         # OpenAI API supports n parameter for multiple completions in a single call
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+        return {
+            'model': self.model,
+            'messages': [
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=1000,
-            n=self.num_completions,
-            temperature=0.7  # Add some randomness for diversity in completions
-        )
+            'n': self.num_completions,
+            **self._sampling_params()
+        }
+    
+    def _read_response(self, prompt: str, headers, response) -> List[str]:
+        """Report the headers and usage of a chat completion response and return its choices."""
+        # The raw response exposes the rate limit headers for adaptive throttling
+        self.throttling_manager.record_response_headers(headers)
+        
+        if response.usage is not None:
+            self._record_usage(prompt, response.usage)
         
         # Extract all choices from the response
         responses = [choice.message.content for choice in response.choices]
         return responses
+    
+    def _record_usage(self, prompt: str, usage):
+        """Report the tokens used by a chat completion and its prompt cache usage."""
+        self.throttling_manager.record_usage(usage.total_tokens)
+        # OpenAI caches long prompt prefixes automatically and reports the cached part of prompt_tokens
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        self._record_prompt_cache_usage(prompt, usage.prompt_tokens - cached_tokens, cached_tokens)
+    
+    def _sampling_params(self) -> Dict[str, Any]:
+        """Sampling parameters sent with each request."""
+        return {
+            'max_tokens': self.max_tokens,
+            'temperature': 0.7  # Add some randomness for diversity in completions
+        }
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Estimate tokens for one call: the prompt is sent once for all n choices."""
+        return len(prompt) // 4 + self.max_tokens * self.num_completions
@@ -1,6 +1,9 @@
+import asyncio
 import anthropic
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
-from .base import LLMApi
+from .base import LLMApi, extract_score
+from ..http_client import get_http_client, get_async_http_client
 
 class ClaudeApi(LLMApi):
     """API implementation for Claude."""
@@ -10,37 +13,166 @@ class ClaudeApi(LLMApi):
         # Set the name before calling the parent constructor
         config['name'] = 'Claude'
         super().__init__(config, global_config)
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = anthropic.Anthropic(
+            api_key=self.api_key, base_url=self.base_url,
+            max_retries=self._sdk_max_retries(anthropic.DEFAULT_MAX_RETRIES),
+            http_client=get_http_client(self.global_config, anthropic.DefaultHttpxClient)
+        )
+        
+        # Claude returns one completion per Messages API request
+        self._complete_with_throttling = self.throttling_manager.with_throttling(
+            self._complete,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_completion_tokens
+        )
+        self._generate_with_throttling = self._generate
+        self._acomplete_with_throttling = self.throttling_manager.with_async_throttling(
+            self._acomplete,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_completion_tokens
+        )
     
     def _generate(self, prompt: str) -> List[str]:
         """
         Generate one or more responses from Claude.
         
+        The completions are requested concurrently, each throttled on its own.
+        
         Args:
             prompt: The prompt to send to Claude
             
         Returns:
             A list of responses from Claude
         """
-        responses = []
-        
         # Unfortunately, Claude API doesn't natively support multiple completions in one call,
         # so we'll make multiple calls with different random seeds
-        for i in range(self.num_completions):
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=1000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                # Use a different seed for each completion to ensure diversity
-                # Note: Some APIs may not support this parameter
-                system=f"Seed: {i}" if i > 0 else None
-            )
-            responses.append(message.content[0].text)
+        if self.num_completions > 1:
+            with ThreadPoolExecutor(max_workers=self.num_completions) as executor:
+                responses = list(executor.map(
+                    lambda i: self._complete_with_throttling(prompt, i), range(self.num_completions)
+                ))
+        else:
+            responses = [self._complete_with_throttling(prompt, 0)]
                 
         # Ensure we return at least one response, even if empty
         if not responses:
             responses = ["Error: Failed to generate any responses from Claude"]
             
         return responses
+    
+    async def _agenerate(self, prompt: str) -> List[str]:
+        """
+        Generate one or more responses from Claude with the async client.
+        
+        Args:
+            prompt: The prompt to send to Claude
+            
+        Returns:
+            A list of responses from Claude
+        """
+        responses = await asyncio.gather(*(
+            self._acomplete_with_throttling(prompt, i) for i in range(self.num_completions)
+        ))
+        return list(responses) or ["Error: Failed to generate any responses from Claude"]
+    
+    def _complete(self, prompt: str, index: int) -> str:
+        """
+        Request a single completion from Claude.
+        
+        Args:
+            prompt: The prompt to send to Claude
+            index: Index of the completion, used as its seed
+            
+        Returns:
+            The text of the completion
+        """
+        raw_response = self.client.messages.with_raw_response.create(**self._request_params(prompt, index))
+        return self._read_response(prompt, raw_response.headers, raw_response.parse())
+    
+    async def _acomplete(self, prompt: str, index: int) -> str:
+        """Request a single completion from Claude with the async client."""
+        raw_response = await self._get_async_client().messages.with_raw_response.create(
+            **self._request_params(prompt, index)
+        )
+        return self._read_response(prompt, raw_response.headers, await raw_response.parse())
+    
+    def _stream_score(self, prompt: str, index: int, max_tokens: int) -> str:
+        """
+        Stream a single completion from Claude until it contains a score.
+        
+        Args:
+            prompt: A prompt asking for a score
+            index: Index of the completion, used as its seed
+            max_tokens: Output token limit of the completion
+            
+        Returns:
+            The score, or the full completion text if it contains none
+        """
+        params = {**self._request_params(prompt, index), 'max_tokens': max_tokens}
+        text = ""
+        score = None
+        # Leaving the block closes the connection, which stops the generation
+        with self.client.messages.stream(**params) as stream:
+            self.throttling_manager.record_response_headers(stream.response.headers)
+            for delta in stream.text_stream:
+                text += delta
+                score = extract_score(text, complete=False)
+                if score is not None:
+                    break
+            message = stream.current_message_snapshot
+        
+        # The output token count is only final if the stream ran to the end
+        self._record_usage(prompt, message.usage, max(message.usage.output_tokens, len(text) // 4))
+        return score or extract_score(text) or text
+    
+    def _create_async_client(self):
+        """Create the async Anthropic client, with the same retry policy as the sync one."""
+        return anthropic.AsyncAnthropic(
+            api_key=self.api_key, base_url=self.base_url, max_retries=self.client.max_retries,
+            http_client=get_async_http_client(self.global_config, anthropic.DefaultAsyncHttpxClient)
+        )
+    
+    def _request_params(self, prompt: str, index: int) -> Dict[str, Any]:
+        """Build the Messages API parameters of one completion."""
+        content = prompt
+        if getattr(prompt, 'prefix', None):
+            # Mark the shared prefix for prompt caching; calls that repeat it read it from the cache.
+            # The seed system prompt comes before it, so the prefix is shared per completion index.
+            content = [
+                {"type": "text", "text": prompt.prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt.suffix}
+            ]
+        params = {
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            'messages': [
+                {"role": "user", "content": content}
+            ]
+        }
+        # Use a different seed for each completion to ensure diversity
+        # Note: Some APIs may not support this parameter
+        if index > 0:
+            params['system'] = f"Seed: {index}"
+        return params
+    
+    def _read_response(self, prompt: str, headers, message) -> str:
+        """Report the headers and usage of a Messages API response and return its text."""
+        # The raw response exposes the rate limit headers for adaptive throttling
+        self.throttling_manager.record_response_headers(headers)
+        self._record_usage(prompt, message.usage, message.usage.output_tokens)
+        return message.content[0].text
+    
+    def _record_usage(self, prompt: str, usage, output_tokens: int):
+        """Report the tokens used by a Messages API call and its prompt cache usage."""
+        # Cached input tokens are reported apart from input_tokens; cache reads do not count
+        # towards the input token rate limit, cache writes do
+        cache_read_tokens = getattr(usage, 'cache_read_input_tokens', None) or 0
+        cache_creation_tokens = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        self.throttling_manager.record_usage(usage.input_tokens + cache_creation_tokens + output_tokens)
+        self._record_prompt_cache_usage(prompt, usage.input_tokens, cache_read_tokens, cache_creation_tokens)
+    
+    def _estimate_completion_tokens(self, prompt: str, index: int) -> int:
+        """Estimate the input plus output tokens of a single completion."""
+        return len(prompt) // 4 + self.max_tokens
@@ -1,17 +1,122 @@
 import google.generativeai as genai
+from google.api_core.exceptions import InvalidArgument
 from typing import Dict, Any, List
-from .base import LLMApi
+from .base import LLMApi, extract_score
 import re
+import os
+import json
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# Whether each model honors candidate_count > 1, learned from the first multi-completion call
+_candidate_count_support: Dict[str, bool] = {}
+
+def _load_manifest(path: str, ttl_seconds: float):
+    """
+    Load the unexpired sections of the cached Gemini model manifest.
+    
+    Each section carries its own timestamp, so entries added later (such as
+    candidate_count) expire with their own TTL rather than the model list's.
+    
+    Args:
+        path: Path of the manifest file
+        ttl_seconds: Age after which a section is ignored
+        
+    Returns:
+        Tuple of (sections by name, update time of each section)
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    if not isinstance(manifest, dict):
+        return {}, {}
+    
+    updated = manifest.pop('updated', {})
+    if not isinstance(updated, dict):
+        # Manifests written with a single timestamp for every section
+        updated = {section: updated for section in manifest}
+    
+    now = time.time()
+    fresh = {
+        section for section in manifest
+        if isinstance(updated.get(section), (int, float)) and now - updated[section] <= ttl_seconds
+    }
+    return (
+        {section: manifest[section] for section in fresh},
+        {section: updated[section] for section in fresh}
+    )
+
+def _read_manifest(path: str, ttl_seconds: float) -> Dict[str, Any]:
+    """
+    Read the cached Gemini model manifest.
+    
+    Args:
+        path: Path of the manifest file
+        ttl_seconds: Age after which a section is ignored
+        
+    Returns:
+        The unexpired sections of the manifest; empty if it is missing or unreadable
+    """
+    return _load_manifest(path, ttl_seconds)[0]
+
+def _update_manifest(path: str, ttl_seconds: float, **sections: Dict[str, Any]):
+    """
+    Merge entries into the cached Gemini model manifest.
+    
+    Args:
+        path: Path of the manifest file
+        ttl_seconds: Age after which existing sections are discarded
+        sections: Entries to merge, by section (models, resolved, candidate_count)
+    """
+    manifest, updated = _load_manifest(path, ttl_seconds)
+    for section, entries in sections.items():
+        manifest.setdefault(section, {}).update(entries)
+        # The merged section is now current
+        updated[section] = time.time()
+    manifest['updated'] = updated
+    
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so other processes never read a partial manifest
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Unable to write Gemini model manifest {path}: {e}")
+
+def _is_candidate_count_error(error: Exception) -> bool:
+    """Whether an InvalidArgument error is about the candidate_count parameter (candidateCount in the REST API)."""
+    return re.search(r"candidate_?count", str(error), re.IGNORECASE) is not None
 
 class GeminiApi(LLMApi):
     """API implementation for Gemini."""
     
+    default_max_tokens = 2048
+    
     def __init__(self, config: Dict[str, Any], global_config: Dict[str, Any] = None):
         """Initialize with Gemini-specific configuration."""
         # Set the name before calling the parent constructor
         config['name'] = 'Gemini'
         super().__init__(config, global_config)
         
+        # Models that ignore candidate_count need one generate_content call per completion
+        self._generate_content_with_throttling = self.throttling_manager.with_throttling(
+            self._generate_content,
+            llm_name=self.name,
+            llm_config=config,
+            estimate_tokens=self._estimate_call_tokens
+        )
+        self._generate_with_throttling = self._generate
+        # No _agenerate override: generate_content_async runs on a grpc.aio channel that the
+        # SDK caches per process and binds to the first event loop, while each evaluate call
+        # runs its own loop, so async calls use the inherited worker-thread _agenerate
+        
         # Configure the API with the key
         genai.configure(api_key=self.api_key)
         
@@ -19,6 +124,21 @@ class GeminiApi(LLMApi):
         self.configured_model_name = self.model
         self.model_instance = None
         
+        # Local manifest of discovered models, so discovery runs once per TTL instead of every start
+        manifest_config = config.get('model_manifest', {})
+        self.manifest_path = manifest_config.get('path', '.cache/gemini_models.json')
+        self.manifest_ttl = manifest_config.get('ttl_hours', 24) * 3600
+        manifest = _read_manifest(self.manifest_path, self.manifest_ttl)
+        for model_name, supported in manifest.get('candidate_count', {}).items():
+            _candidate_count_support.setdefault(model_name, supported)
+        
+        resolved_model_name = manifest.get('resolved', {}).get(self.configured_model_name)
+        if resolved_model_name:
+            self.model_name = resolved_model_name.split('/')[-1]
+            self.model_instance = genai.GenerativeModel(model_name=resolved_model_name)
+            print(f"Using model from manifest: {resolved_model_name}")
+            return
+        
         try:
             # First, try to use the explicitly configured model
             try:
@@ -31,20 +151,7 @@ class GeminiApi(LLMApi):
                 print(f"Could not initialize configured model: {model_error}")
                 
             # If that fails, list available models and select one
-            print("Listing available Gemini models:")
-            available_models = list(genai.list_models())
-            
-            # Print available models for debugging
-            for model in available_models:
-                model_name = model.name
-                # Extract just the model name without the full path
-                short_name = model_name.split('/')[-1] if '/' in model_name else model_name
-                
-                if hasattr(model, "supported_generation_methods"):
-                    methods = model.supported_generation_methods
-                else:
-                    methods = "Unknown"
-                print(f"  - {short_name}: {methods}")
+            available_models = self._get_available_models(manifest)
             
             # Define a priority order for model selection
             priority_models = [
@@ -82,6 +189,12 @@ class GeminiApi(LLMApi):
             if selected_model:
                 print(f"Initializing with model: {selected_model.name}")
                 self.model_instance = genai.GenerativeModel(model_name=selected_model.name)
+                self.model_name = selected_model.name.split('/')[-1]
+                # Later runs start directly with the selected model
+                _update_manifest(
+                    self.manifest_path, self.manifest_ttl,
+                    resolved={self.configured_model_name: selected_model.name}
+                )
             elif self.configured_model_name:
                 self.model_instance = genai.GenerativeModel(model_name=self.configured_model_name)
             else:
@@ -96,6 +209,43 @@ class GeminiApi(LLMApi):
     def get_model_name(self) -> str:
         """Returns the name of the initialized Gemini model."""
         return getattr(self, 'model_name', 'gemini')
+    
+    def _get_available_models(self, manifest: Dict[str, Any]) -> List[Any]:
+        """
+        Get the available Gemini models from the manifest, or list them through the API.
+        
+        Args:
+            manifest: The cached model manifest, empty if missing or expired
+            
+        Returns:
+            Models with name and supported_generation_methods attributes
+        """
+        if manifest.get('models'):
+            return [
+                SimpleNamespace(name=name, supported_generation_methods=methods)
+                for name, methods in manifest['models'].items()
+            ]
+        
+        print("Listing available Gemini models:")
+        available_models = list(genai.list_models())
+        
+        # Print available models for debugging
+        for model in available_models:
+            model_name = model.name
+            # Extract just the model name without the full path
+            short_name = model_name.split('/')[-1] if '/' in model_name else model_name
+            
+            if hasattr(model, "supported_generation_methods"):
+                methods = model.supported_generation_methods
+            else:
+                methods = "Unknown"
+            print(f"  - {short_name}: {methods}")
+        
+        _update_manifest(self.manifest_path, self.manifest_ttl, models={
+            model.name: list(getattr(model, "supported_generation_methods", []))
+            for model in available_models
+        })
+        return available_models
 
     def _generate(self, prompt: str) -> List[str]:
         """
@@ -113,60 +263,207 @@ class GeminiApi(LLMApi):
         responses = []
         
         # Configure generation parameters
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 2048,
-            # Note: candidate_count is supported in some Gemini models
-            "candidate_count": min(self.num_completions, 8)  # Limited to 8
-        }
+        generation_config = self._sampling_params()
         
-        # Try to generate multiple responses in one call if supported
-        response = self.model_instance.generate_content(
-            contents=prompt,
-            generation_config=generation_config
-        )
+        if self._should_request_candidates():
+            # Try to generate multiple responses in one call if supported
+            try:
+                response = self._generate_content_with_throttling(prompt, self._candidates_config(generation_config))
+            except InvalidArgument as e:
+                # Other 400s (bad API key, oversized prompt) say nothing about candidate_count
+                if not _is_candidate_count_error(e):
+                    raise
+                self._reject_candidate_count(e)
+            else:
+                responses = self._read_candidates(response)
+                if len(responses) > 1:
+                    return responses
         
-        # Check if we got multiple candidates
-        if hasattr(response, 'candidates') and len(response.candidates) > 1:
-            # Extract text from each candidate
-            for candidate in response.candidates:
-                if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                    text = ''.join(part.text for part in candidate.content.parts if hasattr(part, 'text'))
-                    responses.append(text)
+        # If multiple completions were requested but only one is returned per call,
+        # make the remaining calls concurrently with different temperatures
+        variations = self._fallback_configs(generation_config, len(responses))
+        if len(variations) > 1:
+            with ThreadPoolExecutor(max_workers=len(variations)) as executor:
+                resps = list(executor.map(
+                    lambda config: self._generate_content_with_throttling(prompt, config), variations
+                ))
         else:
-            # Extract the text from a single response
-            if hasattr(response, 'text'):
-                responses.append(response.text)
-            elif hasattr(response, 'parts'):
-                text = ''.join(part.text for part in response.parts if hasattr(part, 'text'))
-                responses.append(text)
-            else:
-                responses.append(str(response))
-            
-            # If multiple completions were requested but only one was returned,
-            # make additional calls with different temperatures
-            for i in range(1, self.num_completions):
-                # Vary the temperature for diversity
-                gen_config_variation = generation_config.copy()
-                gen_config_variation["temperature"] = min(0.9, generation_config["temperature"] + i * 0.1)
-                
-                resp = self.model_instance.generate_content(
-                    contents=prompt,
-                    generation_config=gen_config_variation
-                )
-                
-                if hasattr(resp, 'text'):
-                    responses.append(resp.text)
-                elif hasattr(resp, 'parts'):
-                    text = ''.join(part.text for part in resp.parts if hasattr(part, 'text'))
-                    responses.append(text)
-                else:
-                    responses.append(str(resp))
+            resps = [self._generate_content_with_throttling(prompt, config) for config in variations]
+        responses.extend(self._response_text(resp) for resp in resps)
         
         # Ensure we have at least one response
         if not responses:
             responses.append("Failed to generate any responses from Gemini")
             
         return responses
+    
+    def _should_request_candidates(self) -> bool:
+        """Whether to ask for all completions in one call, i.e. the model is not known to ignore candidate_count."""
+        return self.num_completions > 1 and _candidate_count_support.get(self.get_model_name()) is not False
+    
+    def _candidates_config(self, generation_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Generation parameters asking for several candidates in one call."""
+        # Note: candidate_count is supported in some Gemini models
+        return dict(generation_config, candidate_count=min(self.num_completions, 8))  # Limited to 8
+    
+    def _read_candidates(self, response) -> List[str]:
+        """
+        Extract the texts of a response to a multi-candidate request.
+        
+        Whether the model returned several candidates is remembered for the model,
+        so later requests skip the multi-candidate call when it is not supported.
+        
+        Args:
+            response: The Gemini response
+            
+        Returns:
+            The text of each candidate
+        """
+        supported = hasattr(response, 'candidates') and len(response.candidates) > 1
+        self._set_candidate_count_support(supported)
+        
+        if not supported:
+            return [self._response_text(response)]
+        
+        responses = []
+        # Extract text from each candidate
+        for candidate in response.candidates:
+            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+                text = ''.join(part.text for part in candidate.content.parts if hasattr(part, 'text'))
+                responses.append(text)
+        return responses
+    
+    def _reject_candidate_count(self, error: Exception):
+        """
+        Handle a model rejecting candidate_count with a 400, which is not retried.
+        
+        The model is marked as not supporting it, so this and later requests make
+        single-candidate calls instead of failing the same probe again.
+        
+        Args:
+            error: The InvalidArgument error of the multi-candidate call
+        """
+        print(f"{self.get_model_name()} rejected candidate_count; using one call per completion: {error}")
+        self._set_candidate_count_support(False)
+    
+    def _set_candidate_count_support(self, supported: bool):
+        """Remember whether the model honors candidate_count, in this process and in the manifest."""
+        model_name = self.get_model_name()
+        if _candidate_count_support.get(model_name) is not supported:
+            _candidate_count_support[model_name] = supported
+            # Other processes and later runs skip the probe call too
+            _update_manifest(self.manifest_path, self.manifest_ttl, candidate_count={model_name: supported})
+    
+    def _fallback_configs(self, generation_config: Dict[str, Any], start: int) -> List[Dict[str, Any]]:
+        """Generation parameters of the single-candidate calls for completions start to num_completions."""
+        variations = []
+        for i in range(start, self.num_completions):
+            # Vary the temperature for diversity
+            gen_config_variation = generation_config.copy()
+            gen_config_variation["temperature"] = min(0.9, generation_config["temperature"] + i * 0.1)
+            variations.append(gen_config_variation)
+        return variations
+    
+    def _generate_content(self, prompt: str, generation_config: Dict[str, Any]):
+        """
+        Make a single generate_content call.
+        
+        Args:
+            prompt: The prompt to send to Gemini
+            generation_config: Generation parameters of the call
+            
+        Returns:
+            The Gemini response
+        """
+        response = self.model_instance.generate_content(
+            contents=prompt,
+            generation_config=generation_config
+        )
+        self._record_usage(response)
+        return response
+    
+    def _stream_score(self, prompt: str, index: int, max_tokens: int) -> str:
+        """
+        Stream a single completion from Gemini until it contains a score.
+        
+        Args:
+            prompt: A prompt asking for a score
+            index: Index of the completion, which sets its temperature as in _generate
+            max_tokens: Output token limit of the completion
+            
+        Returns:
+            The score, or the full completion text if it contains none
+        """
+        if self.model_instance is None:
+            return "Error: Could not initialize Gemini model. Check API key and available models."
+        
+        generation_config = {**self._sampling_params(), "max_output_tokens": max_tokens}
+        response = self.model_instance.generate_content(
+            contents=prompt,
+            generation_config=self._fallback_configs(generation_config, index)[0],
+            stream=True
+        )
+        text = ""
+        score = None
+        chunk = None
+        try:
+            for chunk in response:
+                text += self._response_text(chunk)
+                score = extract_score(text, complete=False)
+                if score is not None:
+                    # Stop reading; the rest of the completion is not needed
+                    break
+        finally:
+            self._close_stream(response)
+        
+        # Each chunk reports the usage so far
+        if chunk is not None:
+            self._record_usage(chunk)
+        return score or extract_score(text) or text
+    
+    def _close_stream(self, response):
+        """
+        Close the stream of a generate_content(stream=True) response.
+        
+        Leaving the iterator early does not end the stream, so without this the
+        HTTP stream stays open until garbage collection and its connection is
+        not returned to the pool.
+        
+        Args:
+            response: The streaming Gemini response
+        """
+        # GenerateContentResponse has no public close (resolve() reads the stream to the end),
+        # so the private _iterator is used: the gRPC and REST transports both end their server
+        # stream with cancel(). If a later SDK renames it, the stream is left to garbage collection
+        stream = getattr(response, '_iterator', None)
+        cancel = getattr(stream, 'cancel', None)
+        if callable(cancel):
+            cancel()
+    
+    def _estimate_call_tokens(self, prompt: str, generation_config: Dict[str, Any]) -> int:
+        """Estimate the input plus output tokens of a single generate_content call."""
+        return len(prompt) // 4 + self.max_tokens * generation_config.get("candidate_count", 1)
+    
+    def _response_text(self, response) -> str:
+        """Extract the text of a single-candidate response."""
+        if hasattr(response, 'text'):
+            return response.text
+        elif hasattr(response, 'parts'):
+            return ''.join(part.text for part in response.parts if hasattr(part, 'text'))
+        else:
+            return str(response)
+    
+    def _sampling_params(self) -> Dict[str, Any]:
+        """Sampling parameters sent with each request."""
+        return {
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": self.max_tokens
+        }
+    
+    def _record_usage(self, response):
+        """Report the tokens used by a generate_content call to the throttling manager."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None and getattr(usage, 'total_token_count', None):
+            self.throttling_manager.record_usage(usage.total_token_count)
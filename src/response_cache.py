@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+class ResponseCacheMiss(LookupError):
+    """Raised in replay mode when a response is not in the cache."""
+    pass
+
+class ResponseCache:
+    """
+    Persistent content-addressed store of LLM responses in a SQLite database.
+    
+    Each completion is stored under a key derived from the provider, model,
+    prompt, sampling parameters and completion index, so any change to the
+    request is a cache miss. Entries expire after a TTL, and the least recently
+    used entries are evicted when the database grows beyond its size cap.
+    """
+    
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_size_mb: Optional[float] = None):
+        """
+        Initialize the cache and its database table.
+        
+        Args:
+            path: Path of the SQLite database file
+            ttl_seconds: Age after which entries expire (None = never)
+            max_size_mb: Size cap of the stored responses in megabytes (None = unbounded)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this process's connection, reconnecting after a fork."""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._connection
+    
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, params: Dict[str, Any], index: int) -> str:
+        """
+        Build the cache key of one completion.
+        
+        Args:
+            provider: Name of the LLM provider
+            model: Model name
+            prompt: Rendered prompt
+            params: Sampling parameters of the request
+            index: Index of the completion among the num_completions requested
+        
+        Returns:
+            Hex digest identifying the completion
+        """
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        content = json.dumps([provider, model, prompt_hash, params, index], sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response.
+        
+        Args:
+            key: Cache key from make_key
+        
+        Returns:
+            The cached response, or None on a miss or if the entry has expired
+        """
+        now = time.time()
+        with self.lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            # Mark the entry as recently used
+            connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+    
+    def put(self, key: str, response: str):
+        """
+        Store a response, evicting expired and old entries if needed.
+        
+        Args:
+            key: Cache key from make_key
+            response: Response text
+        """
+        now = time.time()
+        with self.lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict(connection, now)
+    
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        """Remove expired entries, then least recently used ones until under 90% of the size cap."""
+        if self.ttl_seconds is not None:
+            connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        if self.max_size_bytes is None:
+            return
+        
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        
+        target = int(self.max_size_bytes * 0.9)
+        stale_keys = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total_size <= target:
+                break
+            stale_keys.append((key,))
+            total_size -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+# Process-wide registry of response caches, one per database file
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+def get_response_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    Get the response cache configured in the response_cache section, if enabled.
+    
+    Args:
+        config: Global application configuration
+    
+    Returns:
+        The shared response cache, or None if caching is disabled
+    """
+    cache_config = config.get('response_cache', {})
+    # Replay mode only makes sense with a cache to replay from
+    if not cache_config.get('enabled', False) and not cache_config.get('replay', False):
+        return None
+    
+    path = cache_config.get('path', '.cache/responses.sqlite')
+    ttl_days = cache_config.get('ttl_days')
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ResponseCache(
+                path,
+                ttl_seconds=ttl_days * 86400 if ttl_days else None,
+                max_size_mb=cache_config.get('max_size_mb')
+            )
+        return _caches[path]
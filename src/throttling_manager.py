@@ -1,11 +1,499 @@
+import os
 import time
 import random
-from typing import Dict, Any, Callable, Optional, TypeVar, cast
-from datetime import datetime, timedelta
+import asyncio
+import sqlite3
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple, TypeVar, Awaitable, cast
+from contextvars import ContextVar
 import threading
 
 T = TypeVar('T')  # Generic type for return value of wrapped function
 
+class RateLimiter:
+    """
+    Token-bucket rate limiter implemented with the generic cell rate algorithm (GCRA).
+    
+    Each request reserves the next free slot under the lock in O(1) and then
+    waits for that slot outside the lock, so concurrent callers are spaced out
+    without being serialized behind a sleeping thread. A request may cost more
+    than one unit, which lets the same limiter budget tokens as well as requests.
+    """
+    
+    def __init__(self, rate_per_minute: float, burst: float = 1):
+        """
+        Initialize the limiter.
+        
+        Args:
+            rate_per_minute: Sustained rate, in units (requests or tokens) per minute
+            burst: Number of units that may be spent back to back after an idle period
+        """
+        self.burst = max(1, burst)
+        self.interval = 60.0 / rate_per_minute  # Seconds per unit at the sustained rate
+        self.capacity = self.burst * self.interval  # Bucket size, in seconds of budget
+        self.theoretical_arrival = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self, cost: float = 1) -> float:
+        """
+        Reserve budget for one request.
+        
+        Args:
+            cost: Units the request consumes
+        
+        Returns:
+            Seconds to wait before sending the request
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.theoretical_arrival = max(self.theoretical_arrival, now) + cost * self.interval
+            return max(0.0, self.theoretical_arrival - self.capacity - now)
+    
+    def adjust(self, delta: float):
+        """
+        Correct an earlier reservation once the actual cost is known.
+        
+        Args:
+            delta: Units to add (positive) or give back (negative)
+        """
+        with self.lock:
+            self.theoretical_arrival += delta * self.interval
+    
+    @property
+    def rate_per_minute(self) -> float:
+        """Current sustained rate, in units per minute."""
+        return 60.0 / self.interval
+    
+    def set_rate(self, rate_per_minute: float):
+        """
+        Change the sustained rate; reservations already made keep their slots.
+        
+        Args:
+            rate_per_minute: New sustained rate, in units per minute
+        """
+        with self.lock:
+            self.interval = 60.0 / rate_per_minute
+            self.capacity = self.burst * self.interval
+    
+    def delay(self, seconds: float):
+        """
+        Hold back every request for at least the given time, e.g. after a Retry-After header.
+        
+        Args:
+            seconds: Seconds from now before the next request may be sent
+        """
+        with self.lock:
+            self.theoretical_arrival = max(
+                self.theoretical_arrival,
+                time.monotonic() + seconds + self.capacity - self.interval
+            )
+    
+    def acquire(self, cost: float = 1) -> float:
+        """
+        Block until a request may be sent.
+        
+        Args:
+            cost: Units the request consumes
+        
+        Returns:
+            Seconds waited
+        """
+        wait_time = self.reserve(cost)
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+    
+    async def acquire_async(self, cost: float = 1) -> float:
+        """
+        Wait without blocking the event loop until a request may be sent.
+        
+        Args:
+            cost: Units the request consumes
+        
+        Returns:
+            Seconds waited
+        """
+        wait_time = self.reserve(cost)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        return wait_time
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    GCRA rate limiter whose state lives in a SQLite database on local disk.
+    
+    Every process using the same database file shares one budget per provider,
+    so N worker processes together stay under the configured rate. The rate is
+    stored with the budget, so an adaptive rate change made by one process
+    applies to all of them.
+    """
+    
+    # Seconds without reservations after which a stored rate is considered stale
+    idle_reset_seconds = 60.0
+    
+    def __init__(self, provider: str, rate_per_minute: float, burst: float, path: str):
+        """
+        Initialize the limiter and its database table.
+        
+        Args:
+            provider: Name of the budget shared by all processes (e.g. Claude or Claude:tokens)
+            rate_per_minute: Sustained rate, in units per minute
+            burst: Number of units that may be spent back to back after an idle period
+            path: Path of the SQLite database file
+        """
+        super().__init__(rate_per_minute, burst)
+        self.provider = provider
+        self.path = path
+        self._connection = None
+        self._pid = None
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            connection = self._connect()
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (provider TEXT PRIMARY KEY, theoretical_arrival REAL, interval REAL)"
+            )
+            try:
+                # Databases created before the rate was shared lack the column
+                connection.execute("ALTER TABLE rate_limits ADD COLUMN interval REAL")
+            except sqlite3.OperationalError:
+                pass
+            # A rate left by an earlier run is dropped; one in use by a running process is adopted
+            connection.execute(
+                "UPDATE rate_limits SET interval = NULL WHERE provider = ? AND theoretical_arrival < ?",
+                (self.provider, time.time() - self.idle_reset_seconds)
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this process's connection, reconnecting after a fork."""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._connection
+    
+    def reserve(self, cost: float = 1) -> float:
+        """
+        Reserve budget for one request in the shared budget.
+        
+        Wall-clock time is used because monotonic clocks are not comparable across processes.
+        
+        Args:
+            cost: Units the request consumes
+        
+        Returns:
+            Seconds to wait before sending the request
+        """
+        with self.lock:
+            connection = self._connect()
+            # BEGIN IMMEDIATE takes the database write lock, making the read-update atomic across processes
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT theoretical_arrival, interval FROM rate_limits WHERE provider = ?", (self.provider,)
+                ).fetchone()
+                if row and row[1]:
+                    # Follow rate changes made by other processes
+                    self.interval = row[1]
+                    self.capacity = self.burst * self.interval
+                now = time.time()
+                theoretical_arrival = (max(row[0], now) if row else now) + cost * self.interval
+                connection.execute(
+                    "INSERT OR REPLACE INTO rate_limits (provider, theoretical_arrival, interval) VALUES (?, ?, ?)",
+                    (self.provider, theoretical_arrival, self.interval)
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            return max(0.0, theoretical_arrival - self.capacity - now)
+    
+    def adjust(self, delta: float):
+        """
+        Correct an earlier reservation in the shared budget.
+        
+        Args:
+            delta: Units to add (positive) or give back (negative)
+        """
+        with self.lock:
+            self._connect().execute(
+                "UPDATE rate_limits SET theoretical_arrival = theoretical_arrival + ? WHERE provider = ?",
+                (delta * self.interval, self.provider)
+            )
+    
+    def set_rate(self, rate_per_minute: float):
+        """
+        Change the sustained rate of every process sharing the budget.
+        
+        Args:
+            rate_per_minute: New sustained rate, in units per minute
+        """
+        with self.lock:
+            self.interval = 60.0 / rate_per_minute
+            self.capacity = self.burst * self.interval
+            self._connect().execute(
+                "INSERT INTO rate_limits (provider, theoretical_arrival, interval) VALUES (?, ?, ?) "
+                "ON CONFLICT(provider) DO UPDATE SET interval = excluded.interval",
+                (self.provider, time.time(), self.interval)
+            )
+    
+    def delay(self, seconds: float):
+        """
+        Hold back every process's requests for at least the given time.
+        
+        Args:
+            seconds: Seconds from now before the next request may be sent
+        """
+        with self.lock:
+            self._connect().execute(
+                "UPDATE rate_limits SET theoretical_arrival = MAX(theoretical_arrival, ?) WHERE provider = ?",
+                (time.time() + seconds + self.capacity - self.interval, self.provider)
+            )
+
+# Process-wide registry of rate limiters, one per provider
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str, rate_per_minute: float, burst: float = 1,
+                     backend: str = 'memory', state_path: Optional[str] = None) -> RateLimiter:
+    """
+    Get the rate limiter shared by every client of a provider in this process.
+    
+    The first caller for a provider decides its settings; later callers share that limiter.
+    
+    Args:
+        provider: Name of the budget (e.g. Claude, or Claude:tokens for its token budget)
+        rate_per_minute: Sustained rate, in units per minute
+        burst: Number of units that may be spent back to back after an idle period
+        backend: 'memory' for a per-process budget, 'sqlite' for a budget shared across processes
+        state_path: Database file of the sqlite backend
+    
+    Returns:
+        The provider's rate limiter
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            if backend == 'sqlite':
+                _limiters[provider] = SQLiteRateLimiter(
+                    provider, rate_per_minute, burst, state_path or '.cache/rate_limits.sqlite'
+                )
+            elif backend == 'memory':
+                _limiters[provider] = RateLimiter(rate_per_minute, burst)
+            else:
+                raise ValueError(f"Unsupported throttling backend: {backend}")
+        return _limiters[provider]
+
+# Response headers carrying a provider's rate limit state, by provider naming scheme
+RATE_LIMIT_HEADERS = {
+    'requests_limit': ('anthropic-ratelimit-requests-limit', 'x-ratelimit-limit-requests'),
+    'requests_remaining': ('anthropic-ratelimit-requests-remaining', 'x-ratelimit-remaining-requests'),
+    'tokens_limit': ('anthropic-ratelimit-tokens-limit', 'x-ratelimit-limit-tokens'),
+    'tokens_remaining': ('anthropic-ratelimit-tokens-remaining', 'x-ratelimit-remaining-tokens')
+}
+
+# HTTP statuses worth retrying; other 4xx errors (bad request, auth, unknown model) are fatal
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+# HTTP statuses meaning the provider wants less traffic (529 is Anthropic's "overloaded")
+RATE_LIMITED_STATUS_CODES = {429, 529}
+
+def parse_rate_limit_headers(headers: Optional[Any]) -> Dict[str, float]:
+    """
+    Read the rate limit state from Anthropic or OpenAI response headers.
+    
+    Args:
+        headers: Mapping of response headers, or None
+    
+    Returns:
+        Dictionary with whichever of requests_limit, requests_remaining,
+        tokens_limit and tokens_remaining the headers carry
+    """
+    limits = {}
+    if not headers:
+        return limits
+    headers = {str(name).lower(): value for name, value in headers.items()}
+    for key, names in RATE_LIMIT_HEADERS.items():
+        for name in names:
+            try:
+                limits[key] = float(headers[name])
+                break
+            except (KeyError, TypeError, ValueError):
+                continue
+    return limits
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Get the HTTP status of a provider error, or None if no response was received."""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        # Google API errors carry the HTTP status as their code
+        code = getattr(error, 'code', None)
+        if isinstance(code, int):
+            status_code = code
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code if isinstance(status_code, int) else None
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Tell transient provider errors from fatal ones.
+    
+    Rate limits, timeouts, conflicts, server errors and lost connections are
+    retried; authentication failures, bad requests and unknown models are not,
+    and neither are errors in our own code.
+    """
+    status_code = get_status_code(error)
+    if status_code is None:
+        error_type = type(error).__name__
+        return (isinstance(error, (ConnectionError, TimeoutError))
+                or 'Connection' in error_type or 'Timeout' in error_type)
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Get the seconds a provider asked us to wait from the Retry-After headers of an error, if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers.get('retry-after-ms')) / 1000
+        if headers.get('retry-after') is not None:
+            return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        # Retry-After may also be an HTTP date
+        try:
+            retry_at = parsedate_to_datetime(headers.get('retry-after'))
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+class AdaptiveRateController:
+    """
+    Adjusts a provider's request rate from its responses, AIMD style.
+    
+    Every successful call raises the rate by a fixed step (additive increase)
+    up to the limit the provider reports in its headers; a rate limit error
+    cuts it by a factor (multiplicative decrease). The rate stops growing while
+    the remaining requests or tokens of the provider's window run low.
+    """
+    
+    # Remaining fraction of the provider's window below which the rate is not increased
+    low_watermark = 0.1
+    # Minimum seconds between two decreases, so one burst of 429s counts once
+    decrease_cooldown = 1.0
+    
+    def __init__(self, limiter: RateLimiter, rate_per_minute: float, min_rate_per_minute: float,
+                 max_rate_per_minute: float, increase_step: float, decrease_factor: float,
+                 token_limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the controller.
+        
+        Args:
+            limiter: Request limiter whose rate is adjusted
+            rate_per_minute: Starting request rate
+            min_rate_per_minute: Rate never gone below
+            max_rate_per_minute: Rate never gone above until the provider reports its limit
+            increase_step: Requests per minute added after each successful call
+            decrease_factor: Factor applied to the rate after a rate limit error
+            token_limiter: Token limiter, whose rate follows the token limit the provider reports
+        """
+        self.limiter = limiter
+        self.token_limiter = token_limiter
+        self.rate = rate_per_minute
+        self.min_rate = min_rate_per_minute
+        self.max_rate = max_rate_per_minute
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+    
+    def on_success(self, headers: List[Any]):
+        """
+        Update the rate after a successful call.
+        
+        Args:
+            headers: Response headers of the provider calls made by the throttled call
+        """
+        limits = {}
+        for response_headers in headers:
+            limits.update(parse_rate_limit_headers(response_headers))
+        
+        with self.lock:
+            if limits.get('requests_limit'):
+                # The provider's own limit replaces the configured ceiling
+                self.max_rate = limits['requests_limit']
+            if self.token_limiter is not None and limits.get('tokens_limit'):
+                self.token_limiter.set_rate(limits['tokens_limit'])
+            
+            running_low = any(
+                limits.get(f'{unit}_limit') and limits.get(f'{unit}_remaining') is not None
+                and limits[f'{unit}_remaining'] < self.low_watermark * limits[f'{unit}_limit']
+                for unit in ('requests', 'tokens')
+            )
+            # Start from the limiter's rate, which other processes may have changed
+            self.rate = self.limiter.rate_per_minute
+            if not running_low:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self.limiter.set_rate(self.rate)
+    
+    def on_rate_limited(self, retry_after: Optional[float]) -> float:
+        """
+        Update the rate after a rate limit error.
+        
+        Args:
+            retry_after: Seconds the provider asked us to wait, or None
+        
+        Returns:
+            New request rate, in requests per minute
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.decrease_cooldown:
+                self.rate = max(self.min_rate, self.limiter.rate_per_minute * self.decrease_factor)
+                self.limiter.set_rate(self.rate)
+                self.last_decrease = now
+            rate = self.rate
+        
+        if retry_after:
+            # Hold back every client of the provider, not just the one that was refused
+            self.limiter.delay(retry_after)
+        return rate
+
+# Process-wide registry of adaptive controllers, one per provider
+_controllers: Dict[str, AdaptiveRateController] = {}
+
+def get_rate_controller(provider: str, limiter: RateLimiter, settings: Dict[str, Any],
+                        token_limiter: Optional[RateLimiter] = None) -> AdaptiveRateController:
+    """
+    Get the adaptive controller shared by every client of a provider in this process.
+    
+    Args:
+        provider: Name of the provider
+        limiter: The provider's request limiter
+        settings: Throttling settings of the provider
+        token_limiter: The provider's token limiter, if tokens are budgeted
+    
+    Returns:
+        The provider's adaptive controller
+    """
+    with _limiters_lock:
+        if provider not in _controllers:
+            _controllers[provider] = AdaptiveRateController(
+                limiter,
+                settings['requests_per_minute'],
+                settings['min_requests_per_minute'],
+                settings['max_requests_per_minute'] or settings['requests_per_minute'],
+                settings['increase_step'],
+                settings['decrease_factor'],
+                token_limiter=token_limiter
+            )
+        return _controllers[provider]
+
+# Tokens the provider reported for the calls made inside the current throttled call
+_reported_tokens: ContextVar[Optional[List[int]]] = ContextVar('reported_tokens', default=None)
+# Response headers of the calls made inside the current throttled call
+_reported_headers: ContextVar[Optional[List[Any]]] = ContextVar('reported_headers', default=None)
+
 class ThrottlingManager:
     """Manages API call throttling to respect rate limits."""
     
@@ -14,25 +502,191 @@ class ThrottlingManager:
         Initialize with throttling configuration.
         
         Args:
-            config: Throttling configuration including requests_per_minute, 
-                   retry_attempts, and backoff_factor
+            config: Throttling configuration including requests_per_minute,
+                   tokens_per_minute, retry_attempts, backoff_factor and adaptive
         """
         # Get global throttling settings
         global_throttling = config.get('throttling', {})
         self.enabled = global_throttling.get('enabled', True)
         self.requests_per_minute = global_throttling.get('requests_per_minute', 20)
+        self.tokens_per_minute = global_throttling.get('tokens_per_minute')  # None disables token budgeting
         self.retry_attempts = global_throttling.get('retry_attempts', 3)
         self.backoff_factor = global_throttling.get('backoff_factor', 2.0)
+        self.burst = global_throttling.get('burst', 1)
+        # Where the per-provider budget lives: 'memory' (this process) or 'sqlite' (shared by processes)
+        self.backend = global_throttling.get('backend', 'memory')
+        self.state_path = global_throttling.get('state_path', '.cache/rate_limits.sqlite')
+        # Adaptive control of the request rate from provider headers and rate limit errors
+        self.adaptive = global_throttling.get('adaptive', False)
+        self.min_requests_per_minute = global_throttling.get('min_requests_per_minute', 1)
+        self.max_requests_per_minute = global_throttling.get('max_requests_per_minute')  # None = requests_per_minute until the provider reports its limit
+        self.increase_step = global_throttling.get('increase_step', 1)
+        self.decrease_factor = global_throttling.get('decrease_factor', 0.5)
+    
+    def record_usage(self, tokens: int):
+        """
+        Report the tokens a provider call actually used, as read from its response.
+        
+        Called from inside a throttled function; the difference with the
+        estimate is given back to (or taken from) the token budget.
+        
+        Args:
+            tokens: Input plus output tokens of the call
+        """
+        reported = _reported_tokens.get()
+        if reported is not None:
+            reported.append(tokens)
+    
+    def record_response_headers(self, headers: Any):
+        """
+        Report the headers of a provider response, for adaptive rate control.
+        
+        Called from inside a throttled function with the raw HTTP response headers.
         
-        # Initialize tracking variables
-        self.last_request_time = datetime.now()
-        self.request_times = []
-        self.lock = threading.Lock()  # For thread safety
+        Args:
+            headers: Mapping of response headers
+        """
+        reported = _reported_headers.get()
+        if reported is not None:
+            reported.append(headers)
     
-    def with_throttling(self, 
-                        func: Callable[..., T], 
+    def _get_settings(self, llm_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge the global throttling settings with LLM-specific ones.
+        
+        Args:
+            llm_config: LLM-specific configuration that may include throttling settings
+        
+        Returns:
+            Dictionary with the rate, retry and adaptive control settings
+        """
+        settings = {
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_per_minute': self.tokens_per_minute,
+            'retry_attempts': self.retry_attempts,
+            'backoff_factor': self.backoff_factor,
+            'burst': self.burst,
+            'adaptive': self.adaptive,
+            'min_requests_per_minute': self.min_requests_per_minute,
+            'max_requests_per_minute': self.max_requests_per_minute,
+            'increase_step': self.increase_step,
+            'decrease_factor': self.decrease_factor
+        }
+        if llm_config and 'throttling' in llm_config:
+            for key in settings:
+                settings[key] = llm_config['throttling'].get(key, settings[key])
+        return settings
+    
+    def _get_limiters(self, llm_name: Optional[str], settings: Dict[str, Any]) -> Tuple[
+            RateLimiter, Optional[RateLimiter], Optional[AdaptiveRateController]]:
+        """
+        Get the request and token limiters shared by all clients of the LLM provider.
+        
+        Returns:
+            Tuple of (request limiter, token limiter or None if tokens are not budgeted,
+            adaptive controller or None if the rate is fixed)
+        """
+        provider = llm_name or 'default'
+        request_limiter = get_rate_limiter(
+            provider,
+            settings['requests_per_minute'],
+            settings['burst'],
+            backend=self.backend,
+            state_path=self.state_path
+        )
+        
+        token_limiter = None
+        if settings['tokens_per_minute']:
+            # Providers count tokens per minute, so a full minute of tokens may be spent at once
+            token_limiter = get_rate_limiter(
+                f"{provider}:tokens",
+                settings['tokens_per_minute'],
+                settings['tokens_per_minute'],
+                backend=self.backend,
+                state_path=self.state_path
+            )
+        
+        controller = None
+        if settings['adaptive']:
+            controller = get_rate_controller(provider, request_limiter, settings, token_limiter)
+        return request_limiter, token_limiter, controller
+    
+    def _reserve(self, request_limiter: RateLimiter, token_limiter: Optional[RateLimiter],
+                 estimated_tokens: int, llm_name: Optional[str]) -> float:
+        """
+        Reserve one request and the estimated tokens, and report long waits.
+        
+        Returns:
+            Seconds to wait before sending the request
+        """
+        llm_info = f" for {llm_name}" if llm_name else ""
+        
+        wait_time = request_limiter.reserve()
+        # Waits longer than the normal spacing between requests mean a queue has formed
+        if wait_time > request_limiter.interval:
+            print(f"Rate limit reached{llm_info}. Waiting {wait_time:.2f} seconds...")
+        
+        if token_limiter is not None:
+            token_wait_time = token_limiter.reserve(estimated_tokens)
+            if token_wait_time > 0:
+                print(f"Token budget reached{llm_info}. Waiting {token_wait_time:.2f} seconds...")
+            wait_time = max(wait_time, token_wait_time)
+        
+        return wait_time
+    
+    def _settle(self, token_limiter: Optional[RateLimiter], estimated_tokens: int,
+                reported: List[int], failed: bool):
+        """Replace the estimated token cost with the usage reported by the provider."""
+        if token_limiter is None:
+            return
+        if reported:
+            actual_tokens = sum(reported)
+        else:
+            # A call that failed without reporting usage is assumed to have cost nothing
+            actual_tokens = 0 if failed else estimated_tokens
+        if actual_tokens != estimated_tokens:
+            token_limiter.adjust(actual_tokens - estimated_tokens)
+    
+    def _get_backoff_time(self, error: Exception, attempt: int, retry_attempts: int,
+                          backoff_factor: float, controller: Optional[AdaptiveRateController],
+                          llm_name: Optional[str]) -> Optional[float]:
+        """
+        Decide whether a failed attempt is retried, and after how long.
+        
+        A Retry-After header from the provider takes precedence over exponential
+        backoff with jitter. Rate limit errors also slow down the adaptive controller.
+        
+        Returns:
+            Seconds to wait before retrying, or None if the error should be raised
+        """
+        llm_info = f" for {llm_name}" if llm_name else ""
+        error_type = type(error).__name__
+        
+        if not is_retryable_error(error):
+            print(f"API call{llm_info} failed with {error_type}, which is not retryable: {str(error)}")
+            return None
+        if attempt >= retry_attempts:
+            return None
+        
+        retry_after = get_retry_after(error)
+        if controller is not None and get_status_code(error) in RATE_LIMITED_STATUS_CODES:
+            rate = controller.on_rate_limited(retry_after)
+            print(f"Rate limited{llm_info}. Lowering the request rate to {rate:.1f} per minute")
+        
+        if retry_after is not None:
+            backoff_time = retry_after
+        else:
+            backoff_time = (backoff_factor ** attempt) * (1 + random.uniform(0, 0.5))
+        
+        print(f"API call{llm_info} failed with {error_type}: {str(error)}")
+        print(f"Retrying in {backoff_time:.2f} seconds (attempt {attempt+1}/{retry_attempts})...")
+        return backoff_time
+    
+    def with_throttling(self,
+                        func: Callable[..., T],
                         llm_name: Optional[str] = None,
-                        llm_config: Optional[Dict[str, Any]] = None) -> Callable[..., T]:
+                        llm_config: Optional[Dict[str, Any]] = None,
+                        estimate_tokens: Optional[Callable[..., int]] = None) -> Callable[..., T]:
         """
         Decorator to apply throttling to a function.
         
@@ -40,77 +694,121 @@ class ThrottlingManager:
             func: Function to wrap with throttling
             llm_name: Name of the LLM for logging
             llm_config: LLM-specific configuration that may include throttling settings
-            
+            estimate_tokens: Called with the function's arguments to estimate the tokens a call will use
+        
         Returns:
             Wrapped function with throttling applied
         """
-        # Adjust settings if LLM-specific config is provided
-        requests_per_minute = self.requests_per_minute
-        retry_attempts = self.retry_attempts
-        backoff_factor = self.backoff_factor
-        
-        if llm_config and 'throttling' in llm_config:
-            llm_throttling = llm_config['throttling']
-            requests_per_minute = llm_throttling.get('requests_per_minute', requests_per_minute)
-            retry_attempts = llm_throttling.get('retry_attempts', retry_attempts)
-            backoff_factor = llm_throttling.get('backoff_factor', backoff_factor)
+        settings = self._get_settings(llm_config)
+        retry_attempts = settings['retry_attempts']
+        backoff_factor = settings['backoff_factor']
+        request_limiter, token_limiter, controller = self._get_limiters(llm_name, settings)
         
         def wrapped(*args: Any, **kwargs: Any) -> T:
             """Wrapped function with throttling."""
             if not self.enabled:
                 return func(*args, **kwargs)
             
-            # Calculate minimum time between requests
-            min_interval = 60.0 / requests_per_minute  # in seconds
+            estimated_tokens = estimate_tokens(*args, **kwargs) if estimate_tokens and token_limiter else 0
             
             for attempt in range(retry_attempts + 1):
-                # Wait if needed to respect rate limits
-                with self.lock:
-                    # Clean up old request times (older than 1 minute)
-                    now = datetime.now()
-                    self.request_times = [t for t in self.request_times 
-                                         if now - t < timedelta(minutes=1)]
-                    
-                    # Check if we're over the rate limit
-                    if len(self.request_times) >= requests_per_minute:
-                        # Calculate time to wait
-                        oldest_time = min(self.request_times)
-                        wait_time = (oldest_time + timedelta(minutes=1) - now).total_seconds()
-                        if wait_time > 0:
-                            llm_info = f" for {llm_name}" if llm_name else ""
-                            print(f"Rate limit reached{llm_info}. Waiting {wait_time:.2f} seconds...")
-                            time.sleep(wait_time + 0.1)  # Add a small buffer
-                    
-                    # Add jitter to avoid thundering herd problem when multiple threads hit limits
-                    jitter = random.uniform(0, 0.5)
-                    time_since_last = (now - self.last_request_time).total_seconds()
-                    
-                    if time_since_last < min_interval:
-                        wait_time = min_interval - time_since_last + jitter
-                        time.sleep(wait_time)
-                    
-                    # Record this request
-                    self.last_request_time = datetime.now()
-                    self.request_times.append(self.last_request_time)
+                # Reserve the budget under the limiters' locks, then wait outside them
+                wait_time = self._reserve(request_limiter, token_limiter, estimated_tokens, llm_name)
+                if wait_time > 0:
+                    time.sleep(wait_time)
                 
+                reported = []
+                headers = []
+                context_token = _reported_tokens.set(reported)
+                headers_token = _reported_headers.set(headers)
+                failed = False
                 try:
                     # Call the actual function
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    if controller is not None:
+                        controller.on_success(headers)
+                    return result
                 except Exception as e:
-                    # Check if this is the last attempt
-                    if attempt >= retry_attempts:
+                    failed = True
+                    # Raise fatal errors and the error of the last attempt
+                    backoff_time = self._get_backoff_time(
+                        e, attempt, retry_attempts, backoff_factor, controller, llm_name
+                    )
+                    if backoff_time is None:
                         raise
                     
-                    # Calculate backoff time with jitter
-                    backoff_time = (backoff_factor ** attempt) * (1 + random.uniform(0, 0.5))
-                    llm_info = f" for {llm_name}" if llm_name else ""
-                    error_type = type(e).__name__
-                    
-                    print(f"API call{llm_info} failed with {error_type}: {str(e)}")
-                    print(f"Retrying in {backoff_time:.2f} seconds (attempt {attempt+1}/{retry_attempts})...")
                     time.sleep(backoff_time)
+                finally:
+                    _reported_tokens.reset(context_token)
+                    _reported_headers.reset(headers_token)
+                    self._settle(token_limiter, estimated_tokens, reported, failed)
             
             # This should never be reached because the last attempt either returns or raises
             return cast(T, None)
+        
+        return wrapped
+    
+    def with_async_throttling(self,
+                              func: Callable[..., Awaitable[T]],
+                              llm_name: Optional[str] = None,
+                              llm_config: Optional[Dict[str, Any]] = None,
+                              estimate_tokens: Optional[Callable[..., int]] = None) -> Callable[..., Awaitable[T]]:
+        """
+        Decorator to apply throttling to a coroutine function.
+        
+        Waits are done with asyncio.sleep, so many requests can be pending in one
+        event loop while still respecting the rate limit.
+        
+        Args:
+            func: Coroutine function to wrap with throttling
+            llm_name: Name of the LLM for logging
+            llm_config: LLM-specific configuration that may include throttling settings
+            estimate_tokens: Called with the function's arguments to estimate the tokens a call will use
+        
+        Returns:
+            Wrapped coroutine function with throttling applied
+        """
+        settings = self._get_settings(llm_config)
+        retry_attempts = settings['retry_attempts']
+        backoff_factor = settings['backoff_factor']
+        request_limiter, token_limiter, controller = self._get_limiters(llm_name, settings)
+        
+        async def wrapped(*args: Any, **kwargs: Any) -> T:
+            """Wrapped coroutine with throttling."""
+            if not self.enabled:
+                return await func(*args, **kwargs)
+            
+            estimated_tokens = estimate_tokens(*args, **kwargs) if estimate_tokens and token_limiter else 0
+            
+            for attempt in range(retry_attempts + 1):
+                wait_time = self._reserve(request_limiter, token_limiter, estimated_tokens, llm_name)
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                
+                reported = []
+                headers = []
+                context_token = _reported_tokens.set(reported)
+                headers_token = _reported_headers.set(headers)
+                failed = False
+                try:
+                    result = await func(*args, **kwargs)
+                    if controller is not None:
+                        controller.on_success(headers)
+                    return result
+                except Exception as e:
+                    failed = True
+                    backoff_time = self._get_backoff_time(
+                        e, attempt, retry_attempts, backoff_factor, controller, llm_name
+                    )
+                    if backoff_time is None:
+                        raise
+                    
+                    await asyncio.sleep(backoff_time)
+                finally:
+                    _reported_tokens.reset(context_token)
+                    _reported_headers.reset(headers_token)
+                    self._settle(token_limiter, estimated_tokens, reported, failed)
             
+            return cast(T, None)
+        
         return wrapped
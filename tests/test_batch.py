@@ -0,0 +1,189 @@
+import os
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src import throttling_manager
+from src.llm_apis import batch
+from src.llm_apis.batch import AnthropicBatchBackend, OpenAIBatchBackend
+from src.throttling_manager import ThrottlingManager
+
+class FakeLLMApi:
+    """LLM API with a stubbed SDK client and an empty response cache."""
+
+    def __init__(self, name, client, num_completions=1):
+        self.name = name
+        self.client = client
+        self.num_completions = num_completions
+        self.stored = {}
+        self.throttling_manager = ThrottlingManager({'throttling': {'requests_per_minute': 6000, 'retry_attempts': 2}})
+
+    def get_model_name(self):
+        return f"{self.name.lower()}-test"
+
+    def _lookup_cache(self, prompt):
+        return [f"key:{prompt}"], None
+
+    def _store_cache(self, keys, responses):
+        self.stored[keys[0]] = responses
+
+    def _request_params(self, prompt, index=0):
+        return {'prompt': prompt, 'index': index}
+
+class FakeAnthropicBatches:
+    """Message Batches endpoints of a fake Anthropic server."""
+
+    def __init__(self, results):
+        self.requests = None
+        self.created = 0
+        self.results_by_id = results
+        self.statuses = ['in_progress', 'ended']
+
+    def create(self, requests):
+        self.requests = requests
+        self.created += 1
+        return SimpleNamespace(id='msgbatch_1')
+
+    def retrieve(self, batch_id):
+        counts = SimpleNamespace(succeeded=1, processing=0)
+        return SimpleNamespace(processing_status=self.statuses.pop(0), request_counts=counts)
+
+    def results(self, batch_id):
+        for custom_id, (result_type, text) in self.results_by_id.items():
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)])
+            yield SimpleNamespace(custom_id=custom_id, result=SimpleNamespace(type=result_type, message=message))
+
+class FakeOpenAIClient:
+    """Files and Batch endpoints of a fake OpenAI server."""
+
+    def __init__(self, status, output_lines):
+        self.uploaded = None
+        self.status = status
+        self.output = '\n'.join(json.dumps(line) for line in output_lines)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose):
+        self.uploaded = file[1].decode('utf-8').splitlines()
+        return SimpleNamespace(id='file-in')
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self.output)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id='batch_1')
+
+    def _retrieve_batch(self, batch_id):
+        counts = SimpleNamespace(completed=2, total=len(self.uploaded))
+        return SimpleNamespace(status=self.status, output_file_id='file-out', request_counts=counts)
+
+def openai_line(custom_id, status_code, contents=()):
+    """A line of an OpenAI batch output file."""
+    body = {'choices': [{'message': {'content': content}} for content in contents]}
+    return {'custom_id': custom_id, 'response': {'status_code': status_code, 'body': body}}
+
+class TransientError(Exception):
+    """HTTP 503 of a provider SDK."""
+    status_code = 503
+
+@pytest.fixture(autouse=True)
+def no_polling_wait(monkeypatch, tmp_path):
+    monkeypatch.setattr(batch.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(throttling_manager.time, 'sleep', lambda seconds: None)
+    # Batch state files go to .cache/batches in the working directory
+    monkeypatch.chdir(tmp_path)
+
+def test_anthropic_batch_returns_succeeded_prompts_only():
+    batches = FakeAnthropicBatches({
+        'prompt-0-0': ('succeeded', "4"),
+        'prompt-1-0': ('errored', None),
+        'prompt-2-0': ('expired', None)
+    })
+    client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+    llm_api = FakeLLMApi('Claude', client)
+
+    responses = AnthropicBatchBackend(llm_api, {'batch': {'poll_interval': 0}}).generate_all(
+        ["clarity", "accuracy", "coverage", "clarity"]
+    )
+
+    assert [request['custom_id'] for request in batches.requests] == ['prompt-0-0', 'prompt-1-0', 'prompt-2-0']
+    # Errored and expired prompts are left for live calls and never cached
+    assert responses == {"clarity": ["4"]}
+    assert llm_api.stored == {"key:clarity": ["4"]}
+
+def test_anthropic_batch_drops_prompts_with_a_failed_completion():
+    batches = FakeAnthropicBatches({
+        'prompt-0-0': ('succeeded', "3"),
+        'prompt-0-1': ('errored', None),
+        'prompt-1-0': ('succeeded', "5"),
+        'prompt-1-1': ('succeeded', "4")
+    })
+    client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+    llm_api = FakeLLMApi('Claude', client, num_completions=2)
+
+    responses = AnthropicBatchBackend(llm_api, {'batch': {'poll_interval': 0}}).generate_all(["clarity", "accuracy"])
+
+    assert responses == {"accuracy": ["5", "4"]}
+
+def test_openai_expired_batch_keeps_completed_requests():
+    client = FakeOpenAIClient('expired', [
+        openai_line('prompt-0', 200, ["2", "3"]),
+        openai_line('prompt-1', 500),
+        openai_line('prompt-2', 200, ["4", None])
+        # prompt-3 expired before it ran and has no output line
+    ])
+    llm_api = FakeLLMApi('ChatGPT', client, num_completions=2)
+
+    responses = OpenAIBatchBackend(llm_api, {'batch': {'poll_interval': 0}}).generate_all(
+        ["clarity", "accuracy", "coverage", "relevance"]
+    )
+
+    assert [json.loads(line)['custom_id'] for line in client.uploaded] == ['prompt-0', 'prompt-1', 'prompt-2', 'prompt-3']
+    assert responses == {"clarity": ["2", "3"]}
+    assert llm_api.stored == {"key:clarity": ["2", "3"]}
+
+def test_openai_collect_reports_choices_without_content_as_errors():
+    client = FakeOpenAIClient('completed', [openai_line('prompt-0', 200, [None])])
+    client.uploaded = ['{}']
+    llm_api = FakeLLMApi('ChatGPT', client)
+
+    results = OpenAIBatchBackend(llm_api, {}).collect('batch_1', ["clarity"])
+
+    assert results == {"clarity": ["Error: Batch response without content"]}
+
+def test_transient_poll_errors_are_retried():
+    batches = FakeAnthropicBatches({'prompt-0-0': ('succeeded', "4")})
+    retrieve = batches.retrieve
+    errors = [TransientError()]
+
+    def flaky_retrieve(batch_id):
+        if errors:
+            raise errors.pop()
+        return retrieve(batch_id)
+
+    batches.retrieve = flaky_retrieve
+    client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+
+    responses = AnthropicBatchBackend(FakeLLMApi('Claude', client), {'batch': {'poll_interval': 0}}).generate_all(["clarity"])
+
+    assert responses == {"clarity": ["4"]}
+
+def test_interrupted_batch_is_resumed_instead_of_resubmitted():
+    batches = FakeAnthropicBatches({'prompt-0-0': ('succeeded', "4")})
+    batches.statuses = ['in_progress']
+    client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+    config = {'batch': {'poll_interval': 0}}
+
+    # The first run crashes while polling
+    with pytest.raises(IndexError):
+        AnthropicBatchBackend(FakeLLMApi('Claude', client), config).generate_all(["clarity"])
+
+    batches.statuses = ['ended']
+    backend = AnthropicBatchBackend(FakeLLMApi('Claude', client), config)
+    responses = backend.generate_all(["clarity"])
+
+    assert batches.created == 1
+    assert responses == {"clarity": ["4"]}
+    # Collected batches are not resumed again
+    assert not os.listdir(backend.state_dir)
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('nltk')
+from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
+
+from src.evaluators.bleu_engine import NgramStats, bleu_stats, bleu_from_stats, pairwise_bleu
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / 'input'
+WEIGHTS = [0.25] * 4
+
+def read_sentences(path):
+    """Lowercased tokens of each table row of a threat model, without the header rows."""
+    return [line.lower().split() for line in path.read_text(encoding='utf-8').splitlines()[2:] if line.strip()]
+
+def file_pairs():
+    """Tokenized (reference, input) sentences of every threat model in the input directory."""
+    return [
+        pytest.param(read_sentences(INPUT_DIR / 'references' / path.name), read_sentences(path), id=path.stem)
+        for path in sorted((INPUT_DIR / 'inputs').glob('*.txt'))
+    ]
+
+def nltk_bleu(references, hypothesis, weights=WEIGHTS):
+    return sentence_bleu(references, hypothesis, weights=weights, smoothing_function=SmoothingFunction().method1)
+
+@pytest.mark.parametrize('references, hypotheses', file_pairs())
+def test_sentence_bleu_matches_nltk_method1(references, hypotheses):
+    reference_stats = [NgramStats(tokens, 4) for tokens in references]
+
+    for hypothesis in hypotheses:
+        hypothesis_stats = NgramStats(hypothesis, 4)
+        for reference, stats in zip(references, reference_stats):
+            expected = nltk_bleu([reference], hypothesis)
+            assert bleu_from_stats(bleu_stats(hypothesis_stats, [stats]), WEIGHTS) == pytest.approx(expected, rel=1e-12, abs=1e-15)
+        # All references at once clip each n-gram to its highest reference count
+        expected = nltk_bleu(references, hypothesis)
+        assert bleu_from_stats(bleu_stats(hypothesis_stats, reference_stats), WEIGHTS) == pytest.approx(expected, rel=1e-12, abs=1e-15)
+
+@pytest.mark.parametrize('references, hypotheses', file_pairs())
+def test_corpus_and_ngram_scores_share_one_set_of_counts(references, hypotheses):
+    reference_flat = [token for tokens in references for token in tokens]
+    hypothesis_flat = [token for tokens in hypotheses for token in tokens]
+    stats = bleu_stats(NgramStats(hypothesis_flat, 4), [NgramStats(reference_flat, 4)])
+
+    assert bleu_from_stats(stats, WEIGHTS) == pytest.approx(nltk_bleu([reference_flat], hypothesis_flat), rel=1e-12)
+    for n in range(4):
+        weights = [0] * 4
+        weights[n] = 1.0
+        assert bleu_from_stats(stats, weights) == pytest.approx(nltk_bleu([reference_flat], hypothesis_flat, weights), rel=1e-12)
+
+def test_short_and_empty_hypotheses_match_nltk():
+    reference = "an attacker floods the login endpoint with requests".split()
+
+    for hypothesis in [[], ["attacker"], ["attacker", "floods"], ["unrelated", "words", "only"]]:
+        stats = bleu_stats(NgramStats(hypothesis, 4), [NgramStats(reference, 4)])
+        assert bleu_from_stats(stats, WEIGHTS) == pytest.approx(nltk_bleu([reference], hypothesis), abs=1e-15)
+
+@pytest.mark.parametrize('references, hypotheses', file_pairs())
+def test_pairwise_bleu_matches_nltk_for_every_pair(references, hypotheses):
+    scores = pairwise_bleu([NgramStats(tokens, 4) for tokens in hypotheses], [NgramStats(tokens, 4) for tokens in references], WEIGHTS)
+
+    expected = [[nltk_bleu([reference], hypothesis) for reference in references] for hypothesis in hypotheses]
+    assert scores == pytest.approx(np.array(expected), rel=1e-9, abs=1e-15)
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip('nltk')
+
+from src.evaluators.bleu_evaluator import BLEUEvaluator
+
+HEADER = "| Threat Type | Scenario | Potential Impact |\n|---|---|---|\n"
+
+@pytest.fixture
+def make_evaluator(monkeypatch):
+    # Whitespace tokenization, so the test needs no NLTK data download
+    monkeypatch.setattr(BLEUEvaluator, '_check_nltk_resources', lambda self: True)
+    monkeypatch.setattr(BLEUEvaluator, '_tokenize_into_words', lambda self, sentence: sentence.lower().split())
+
+    def make_evaluator(top_k):
+        return BLEUEvaluator({'evaluator': {'bleu': {'max_ngram': 2, 'top_k': top_k}}})
+    return make_evaluator
+
+def table(*rows):
+    return HEADER + '\n'.join(f"| Denial of Service | {row} |" for row in rows)
+
+def test_identically_tokenized_references_keep_their_own_index(make_evaluator):
+    reference = table(
+        "Attackers flood the login endpoint",
+        "ATTACKERS FLOOD THE LOGIN ENDPOINT",
+        "Attackers flood the upload endpoint"
+    )
+
+    result = make_evaluator(top_k=3).evaluate(reference, table("Attackers flood the login endpoint"))
+
+    sentence = result['scores']['sentence_level'][0]
+    # Ties keep reference order, and the duplicate is reported with its own text
+    assert [match['reference_index'] for match in sentence['top_references']] == [0, 1, 2]
+    assert [match['reference'] for match in sentence['top_references']] == [
+        "Attackers flood the login endpoint.", "ATTACKERS FLOOD THE LOGIN ENDPOINT.", "Attackers flood the upload endpoint."
+    ]
+    assert sentence['best_reference'] == "Attackers flood the login endpoint."
+    assert sentence['top_references'][0]['bleu'] == sentence['top_references'][1]['bleu'] > sentence['top_references'][2]['bleu']
+
+def test_top_k_skips_unmatched_references_and_defaults_to_best_match(make_evaluator):
+    reference = table("Users cannot reach the dashboard", "Attackers flood the login endpoint")
+    input_text = table("Attackers flood the login endpoint", "Completely unrelated words here")
+
+    top = make_evaluator(top_k=2).evaluate(reference, input_text)['scores']['sentence_level']
+    best = make_evaluator(top_k=1).evaluate(reference, input_text)['scores']['sentence_level']
+
+    assert [match['reference_index'] for match in top[0]['top_references']] == [1]
+    assert top[1]['top_references'] == [] and top[1]['best_reference'] is None
+    assert best[0]['best_reference'] == "Attackers flood the login endpoint."
+    assert 'top_references' not in best[0]
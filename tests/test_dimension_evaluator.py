@@ -0,0 +1,21 @@
+import pytest
+
+from src.evaluators.dimension_evaluator import DimensionEvaluator
+
+@pytest.fixture
+def evaluator():
+    # Parsing does not use the configuration or the LLM API
+    return object.__new__(DimensionEvaluator)
+
+def test_combined_response_keeps_scores_from_1_to_5(evaluator, capsys):
+    response = 'Scores:\n```json\n{"clarity": 4, "accuracy": 5.0, "coverage": 7, "relevance": 0, "style": "3"}\n```'
+
+    parsed = evaluator._parse_combined_response(response, ["clarity", "accuracy", "coverage", "relevance", "style"])
+
+    assert parsed == {"clarity": "4", "accuracy": "5", "style": "3"}
+    assert "coverage, relevance" in capsys.readouterr().out
+
+def test_combined_response_rejects_fractional_and_missing_scores(evaluator):
+    parsed = evaluator._parse_combined_response('{"clarity": 3.5, "accuracy": null}', ["clarity", "accuracy", "coverage"])
+
+    assert parsed == {}
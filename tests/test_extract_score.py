@@ -0,0 +1,28 @@
+import pytest
+
+from src.llm_apis.base import extract_score
+
+@pytest.mark.parametrize('text, score', [
+    ("4", "4"),
+    ("Score: 3.", "3"),
+    ("4/5", "4"),
+    ("2 out of 5", "2"),
+    ("4.\nThe input covers the reference", "4"),
+    ("(score 2) for clarity", "2"),
+    ("1. Read the reference\n2. Compare\nScore: 5", "5"),
+    ("1) Read the reference\n2) Compare\nFinal: 3", "3"),
+    ("Step 2: compare the texts. I rate it 4", "4"),
+])
+def test_extract_score_skips_ranges_list_markers_and_steps(text, score):
+    assert extract_score(text) == score
+
+@pytest.mark.parametrize('text', ["On a scale of 1-5", "1. Read the reference", "Step 2: compare", "3.5", "10"])
+def test_extract_score_finds_no_score(text):
+    assert extract_score(text) is None
+
+@pytest.mark.parametrize('text', ["1", "1.", "1)", "1. Read the reference", "Step 2: compare", "On a scale of 1"])
+def test_partial_text_has_no_score_yet(text):
+    assert extract_score(text, complete=False) is None
+
+def test_partial_text_score_is_final_once_followed_by_other_text():
+    assert extract_score("Score: 4 because", complete=False) == "4"
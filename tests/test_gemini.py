@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('google.generativeai')
+
+from src.llm_apis import gemini
+from src.llm_apis.gemini import GeminiApi
+
+class FakeGenerativeModel:
+    """Gemini model whose async client, like the SDK's grpc.aio channel, is bound to the first event loop."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.loop = None
+
+    def generate_content(self, contents, generation_config):
+        return SimpleNamespace(text="4", usage_metadata=None)
+
+    async def generate_content_async(self, contents, generation_config):
+        loop = asyncio.get_running_loop()
+        if self.loop not in (None, loop):
+            raise RuntimeError("Task got Future attached to a different loop")
+        self.loop = loop
+        return self.generate_content(contents, generation_config)
+
+@pytest.fixture
+def gemini_api(monkeypatch, tmp_path):
+    monkeypatch.setattr(gemini, 'genai', SimpleNamespace(
+        configure=lambda api_key: None,
+        GenerativeModel=FakeGenerativeModel
+    ))
+    config = {'model': 'gemini-1.5-flash', 'model_manifest': {'path': str(tmp_path / 'models.json')}}
+    return GeminiApi(config, {'throttling': {'enabled': False}})
+
+def test_agenerate_works_across_event_loops(gemini_api):
+    # Each evaluate call runs its own event loop with asyncio.run
+    assert asyncio.run(gemini_api.agenerate("Rate the clarity")) == ["4"]
+    assert asyncio.run(gemini_api.agenerate("Rate the accuracy")) == ["4"]
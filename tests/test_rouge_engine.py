@@ -0,0 +1,89 @@
+import random
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('rouge_score')
+from rouge_score import rouge_scorer
+
+from src.evaluators.rouge_engine import LcsIndex, RougeEngine, lcs_length
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / 'input'
+ROUGE_TYPES = ['rouge1', 'rouge2', 'rougeL']
+
+def read_sentences(path):
+    """Table rows of a threat model, without the header rows."""
+    return [line for line in path.read_text(encoding='utf-8').splitlines()[2:] if line.strip()]
+
+def file_pairs():
+    """(reference, input) sentences of every threat model in the input directory."""
+    return [
+        pytest.param(read_sentences(INPUT_DIR / 'references' / path.name), read_sentences(path), id=path.stem)
+        for path in sorted((INPUT_DIR / 'inputs').glob('*.txt'))
+    ]
+
+def assert_same_scores(scores, expected):
+    assert scores.keys() == expected.keys()
+    for rouge_type, score in expected.items():
+        assert tuple(scores[rouge_type]) == pytest.approx(tuple(score), rel=1e-12, abs=1e-15), rouge_type
+
+@pytest.mark.parametrize('use_stemmer', [True, False])
+@pytest.mark.parametrize('references, inputs', file_pairs())
+def test_sentence_scores_match_rouge_scorer(references, inputs, use_stemmer):
+    engine = RougeEngine(ROUGE_TYPES, use_stemmer=use_stemmer)
+    scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=use_stemmer)
+    prepared = [engine.prepare(sentence) for sentence in references]
+
+    for input_sentence in inputs:
+        prediction = engine.prepare(input_sentence)
+        for reference, target in zip(references, prepared):
+            assert_same_scores(engine.score(target, prediction), scorer.score(reference, input_sentence))
+
+@pytest.mark.parametrize('use_stemmer', [True, False])
+def test_whole_texts_and_delegated_types_match_rouge_scorer(use_stemmer):
+    rouge_types = ROUGE_TYPES + ['rouge3', 'rougeLsum']
+    engine = RougeEngine(rouge_types, use_stemmer=use_stemmer)
+    scorer = rouge_scorer.RougeScorer(rouge_types, use_stemmer=use_stemmer)
+
+    for path in sorted((INPUT_DIR / 'inputs').glob('*.txt')):
+        reference = (INPUT_DIR / 'references' / path.name).read_text(encoding='utf-8')
+        input_text = path.read_text(encoding='utf-8')
+        assert_same_scores(engine.score(engine.prepare(reference), engine.prepare(input_text)), scorer.score(reference, input_text))
+
+def test_empty_and_punctuation_only_sentences_match_rouge_scorer():
+    engine = RougeEngine(ROUGE_TYPES, use_stemmer=True)
+    scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=True)
+
+    for reference, prediction in [("", "attackers flood"), ("attackers flood", ""), ("|---|", "attackers"), ("a b", "a")]:
+        assert_same_scores(engine.score(engine.prepare(reference), engine.prepare(prediction)), scorer.score(reference, prediction))
+
+def dp_lcs_length(first, second):
+    """LCS length from rouge_score's dynamic programming table."""
+    return rouge_scorer._lcs_table(first, second)[-1][-1]
+
+def test_bit_parallel_lcs_matches_dynamic_programming_on_long_sentences():
+    rng = random.Random(7)
+    # Long threat scenarios over a small vocabulary, so tokens repeat within sentences
+    references = [[rng.randrange(40) for _ in range(rng.randint(0, 90))] for _ in range(300)]
+    predictions = [[rng.randrange(40) for _ in range(rng.randint(60, 90))] for _ in range(5)] + [[], [99]]
+    index = LcsIndex(references)
+
+    for prediction in predictions:
+        assert index.lengths(prediction) == [dp_lcs_length(reference, prediction) for reference in references]
+
+@pytest.mark.parametrize('first, second', [([], []), ([1], []), ([1, 2, 3], [3, 2, 1]), ([1, 1, 1], [1, 1]), ([1, 2, 1, 2], [2, 1, 2, 1])])
+def test_lcs_length_of_edge_cases(first, second):
+    assert lcs_length(first, second) == dp_lcs_length(first, second)
+
+@pytest.mark.parametrize('references, inputs', file_pairs())
+def test_score_all_with_one_index_matches_rouge_scorer(references, inputs):
+    engine = RougeEngine(ROUGE_TYPES, use_stemmer=True)
+    scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=True)
+    targets = [engine.prepare(sentence) for sentence in references]
+    # One index of all references, reused for every input sentence as in ROUGEEvaluator
+    index = engine.index(targets)
+
+    for input_sentence in inputs:
+        scores = engine.score_all(targets, engine.prepare(input_sentence), index)
+        for reference, reference_scores in zip(references, scores):
+            assert_same_scores(reference_scores, scorer.score(reference, input_sentence))
@@ -0,0 +1,180 @@
+import time
+import itertools
+from email.utils import formatdate
+
+import pytest
+
+from src import throttling_manager
+from src.throttling_manager import (
+    RateLimiter,
+    AdaptiveRateController,
+    ThrottlingManager,
+    RETRYABLE_STATUS_CODES,
+    get_retry_after,
+    is_retryable_error,
+    parse_rate_limit_headers
+)
+
+# Distinct provider names, since limiters and controllers are shared process-wide
+_providers = itertools.count()
+
+class FakeResponse:
+    """HTTP response carried by a provider SDK error."""
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class FakeAPIError(Exception):
+    """Error shaped like the Anthropic and OpenAI SDK status errors."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+def make_manager(**throttling):
+    """Throttling manager whose request rate is fast enough not to wait between attempts."""
+    settings = {'requests_per_minute': 6000, 'retry_attempts': 3, 'backoff_factor': 2.0}
+    settings.update(throttling)
+    return ThrottlingManager({'throttling': settings})
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the sleeps of the throttled calls instead of waiting."""
+    recorded = []
+    monkeypatch.setattr(throttling_manager.time, 'sleep', recorded.append)
+    return recorded
+
+def test_parse_rate_limit_headers_reads_anthropic_and_openai_names():
+    anthropic_headers = {
+        'Anthropic-RateLimit-Requests-Limit': '50',
+        'anthropic-ratelimit-requests-remaining': '3',
+        'anthropic-ratelimit-tokens-limit': '40000'
+    }
+    openai_headers = {'x-ratelimit-limit-requests': '500', 'x-ratelimit-remaining-tokens': 'n/a'}
+
+    assert parse_rate_limit_headers(anthropic_headers) == {
+        'requests_limit': 50.0,
+        'requests_remaining': 3.0,
+        'tokens_limit': 40000.0
+    }
+    assert parse_rate_limit_headers(openai_headers) == {'requests_limit': 500.0}
+    assert parse_rate_limit_headers(None) == {}
+
+def test_get_retry_after_prefers_milliseconds_and_accepts_http_dates():
+    assert get_retry_after(FakeAPIError(429, {'retry-after': '7'})) == 7.0
+    assert get_retry_after(FakeAPIError(429, {'retry-after-ms': '1500', 'retry-after': '7'})) == 1.5
+    assert get_retry_after(FakeAPIError(429)) is None
+
+    retry_at = formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= get_retry_after(FakeAPIError(429, {'retry-after': retry_at})) <= 30
+
+@pytest.mark.parametrize('status_code', sorted(RETRYABLE_STATUS_CODES) + [500, 503, 529])
+def test_transient_statuses_are_retryable(status_code):
+    assert is_retryable_error(FakeAPIError(status_code))
+
+@pytest.mark.parametrize('status_code', [400, 401, 403, 404])
+def test_client_errors_are_not_retryable(status_code):
+    assert not is_retryable_error(FakeAPIError(status_code))
+
+def test_errors_without_status_are_retryable_only_for_connection_problems():
+    assert is_retryable_error(ConnectionError("reset by peer"))
+    assert is_retryable_error(TimeoutError())
+    assert not is_retryable_error(ValueError("bug in our code"))
+
+def test_controller_increases_additively_up_to_reported_limit():
+    limiter = RateLimiter(10)
+    controller = AdaptiveRateController(limiter, 10, 1, 100, increase_step=5, decrease_factor=0.5)
+
+    controller.on_success([{}])
+    assert limiter.rate_per_minute == pytest.approx(15)
+
+    controller.on_success([{'x-ratelimit-limit-requests': '18'}])
+    assert limiter.rate_per_minute == pytest.approx(18)
+
+def test_controller_holds_rate_when_provider_window_runs_low():
+    limiter = RateLimiter(10)
+    controller = AdaptiveRateController(limiter, 10, 1, 100, increase_step=5, decrease_factor=0.5)
+
+    controller.on_success([{'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '2'}])
+
+    assert limiter.rate_per_minute == pytest.approx(10)
+
+def test_controller_decreases_multiplicatively_once_per_burst_of_429s():
+    limiter = RateLimiter(40)
+    controller = AdaptiveRateController(limiter, 40, 4, 100, increase_step=1, decrease_factor=0.5)
+
+    assert controller.on_rate_limited(None) == pytest.approx(20)
+    # A second 429 within the cooldown belongs to the same burst
+    assert controller.on_rate_limited(None) == pytest.approx(20)
+
+    controller.last_decrease -= controller.decrease_cooldown
+    assert controller.on_rate_limited(None) == pytest.approx(10)
+
+    for _ in range(3):
+        controller.last_decrease -= controller.decrease_cooldown
+        controller.on_rate_limited(None)
+    assert limiter.rate_per_minute == pytest.approx(4)
+
+def test_429_is_retried_after_retry_after_and_lowers_the_rate(sleeps):
+    manager = make_manager(adaptive=True, decrease_factor=0.5)
+    provider = f"test-{next(_providers)}"
+    errors = [FakeAPIError(429, {'retry-after': '3'})]
+
+    def call():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert manager.with_throttling(call, llm_name=provider)() == "ok"
+
+    assert 3.0 in sleeps
+    # Halved by the 429, then raised by one step by the successful retry
+    assert throttling_manager._limiters[provider].rate_per_minute == pytest.approx(3001)
+
+def test_529_overload_is_retried_with_backoff(sleeps):
+    manager = make_manager()
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise FakeAPIError(529)
+        return "ok"
+
+    assert manager.with_throttling(call, llm_name=f"test-{next(_providers)}")() == "ok"
+
+    assert len(calls) == 3
+    # Exponential backoff with up to 50% jitter: 1-1.5s, then 2-3s
+    backoffs = [s for s in sleeps if s >= 1]
+    assert len(backoffs) == 2
+    assert 1 <= backoffs[0] <= 1.5 and 2 <= backoffs[1] <= 3
+
+@pytest.mark.parametrize('status_code', [400, 401])
+def test_non_retryable_errors_are_raised_at_once(sleeps, status_code):
+    manager = make_manager()
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise FakeAPIError(status_code)
+
+    with pytest.raises(FakeAPIError):
+        manager.with_throttling(call, llm_name=f"test-{next(_providers)}")()
+
+    assert len(calls) == 1
+    assert not [s for s in sleeps if s >= 1]
+
+def test_retries_stop_after_the_configured_attempts(sleeps):
+    manager = make_manager(retry_attempts=2)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise FakeAPIError(503)
+
+    with pytest.raises(FakeAPIError):
+        manager.with_throttling(call, llm_name=f"test-{next(_providers)}")()
+
+    assert len(calls) == 3